@@ -0,0 +1,139 @@
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+import psycopg2
+import psycopg2.extensions
+from model.backend import SQLITE
+
+class CountingCursor(psycopg2.extensions.cursor):
+    round_trips = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.round_trips += 1
+        return super().execute(query, vars)
+
+    def callproc(self, procname, parameters=None):
+        CountingCursor.round_trips += 1
+        return super().callproc(procname, parameters)
+
+@dataclass
+class Sample:
+    name: str
+    round_trips: float
+    seconds: float
+
+    def __str__(self) -> str:
+        return f"{self.name:<40} {self.round_trips:>8.1f} trips {self.seconds * 1000:>10.3f} ms"
+
+def install(mm) -> None:
+    mm.db.cursor_factory = CountingCursor
+
+def measure(name: str, f: Callable[[], object], repeat: int = 5) -> Sample:
+    f()
+
+    trips = CountingCursor.round_trips
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    seconds = time.perf_counter() - start
+    trips = CountingCursor.round_trips - trips
+
+    return Sample(name, trips / repeat, seconds / repeat)
+
+def create_schema(mm) -> bool:
+    # Step by step, so that a server without pg_trgm still gets the
+    # migrations after it. Returns whether fuzzy search is available.
+    import model.schema
+    if mm.backend == SQLITE:
+        model.schema.create(mm)
+        return True
+    model.schema._apply(mm, model.schema.BASE)
+    fuzzy = True
+    for step in model.schema.MIGRATIONS:
+        try:
+            model.schema._apply(mm, [step])
+        except psycopg2.Error as error:
+            mm.db.rollback()
+            if fuzzy:
+                print(f"fuzzy search skipped: {error}".strip(), file=sys.stderr)
+            fuzzy = False
+    return fuzzy
+
+def count_contacts(mm) -> int:
+    import model.contact
+    return model.contact.count(mm)
+
+def sample_ids(mm, k: int) -> List[int]:
+    # Ids of k contacts that exist now; earlier runs delete the contacts
+    # they create, so a range of ids has holes.
+    query = f"SELECT id FROM contacts ORDER BY random() LIMIT {int(k)}"
+    if mm.backend == SQLITE:
+        return [id for id, in mm.db.execute(query)]
+    with mm.db.cursor() as curs:
+        curs.execute(query)
+        ids = [id for id, in curs]
+    mm.db.commit()
+    return ids
+
+def analyze(mm) -> None:
+    if mm.backend == SQLITE:
+        mm.db.execute("ANALYZE")
+    else:
+        # VACUUM too: with the denormalized columns, seeding leaves a dead
+        # version of every contact row behind.
+        mm.db.commit()
+        mm.db.autocommit = True
+        try:
+            with mm.db.cursor() as curs:
+                curs.execute("VACUUM ANALYZE")
+        finally:
+            mm.db.autocommit = False
+    mm.db.commit()
+
+def _seed_sqlite(mm, missing: int) -> None:
+    # The same rows as on Postgres; phone_rev needs reverse(), which SQLite
+    # lacks.
+    mm.db.create_function("reverse", 1, lambda text: text[::-1], deterministic=True)
+    last = mm.db.execute("SELECT COALESCE(MAX(id), 0) FROM contacts").fetchone()[0]
+    mm.db.execute("""
+        WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < ?)
+        INSERT INTO contacts (first_name, last_name)
+        SELECT
+            json_extract('["Anna", "Boris", "Cristiano", "Dana", "Erlan", "Farida", "Lionel", "Taylor"]', '$[' || (i % 8) || ']') || (i % 1000),
+            json_extract('["Messi", "Ronaldo", "Swift", "Trump", "Neeson", "de Armas"]', '$[' || (i % 6) || ']') || (i % 997)
+        FROM s
+    """, (missing,))
+    mm.db.execute("""
+        INSERT INTO phones (phone_num, contact_id, phone_e164, phone_rev)
+        SELECT num, id, CAST(num AS INTEGER), reverse(num)
+        FROM (
+            SELECT '7' || substr('000000000' || (id * 7919 % 10000000000), -10) AS num, id
+            FROM contacts
+            WHERE id > ?
+        )
+    """, (last,))
+    mm.db.commit()
+
+def seed(mm, n: int) -> None:
+    missing = n - count_contacts(mm)
+    if missing <= 0:
+        return
+    if mm.backend == SQLITE:
+        _seed_sqlite(mm, missing)
+        return
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            WITH new AS (
+                INSERT INTO contacts (first_name, last_name)
+                SELECT
+                    (ARRAY['Anna', 'Boris', 'Cristiano', 'Dana', 'Erlan', 'Farida', 'Lionel', 'Taylor'])[1 + i %% 8] || (i %% 1000),
+                    (ARRAY['Messi', 'Ronaldo', 'Swift', 'Trump', 'Neeson', 'de Armas'])[1 + i %% 6] || (i %% 997)
+                FROM generate_series(1, %(n)s) AS i
+                RETURNING id
+            )
+            INSERT INTO phones (phone_num, contact_id)
+            SELECT '7' || LPAD((id::bigint * 7919 %% 10000000000)::text, 10, '0'), id
+            FROM new
+        """, {'n': missing})
+    mm.db.commit()
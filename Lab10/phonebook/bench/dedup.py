@@ -0,0 +1,67 @@
+import random
+import time
+import model
+import model.dedup
+from bench import seed
+
+SCALES = [100_000, 1_000_000]
+DUPLICATES = 1000
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+def add_duplicates(mm, rng: random.Random) -> set:
+    # Half are misspelled copies that keep the number under another
+    # country code, half are exact copies with a new number.
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            SELECT c.id, c.first_name, c.last_name, p.phone_e164
+            FROM contacts c
+            JOIN phones p ON p.contact_id = c.id
+            ORDER BY random()
+            LIMIT %s
+        """, (DUPLICATES,))
+        originals = curs.fetchall()
+
+        copies = set()
+        for n, (id, first_name, last_name, num) in enumerate(originals):
+            if n % 2 == 0:
+                first_name = typo(first_name, rng)
+                phone = f"+1{num % 10 ** model.dedup.SUFFIX_DIGITS:010d}"
+            else:
+                phone = f"+99{n:09d}"
+            curs.execute("""
+                WITH new AS (
+                    INSERT INTO contacts (first_name, last_name) VALUES (%s, %s) RETURNING id
+                )
+                INSERT INTO phones (phone_num, contact_id) SELECT %s, id FROM new
+                RETURNING contact_id
+            """, (first_name, last_name, phone))
+            copies.add(curs.fetchone()[0])
+    mm.db.commit()
+    return copies
+
+def main():
+    mm = model.ModelManager()
+    rng = random.Random(1)
+
+    for n in SCALES:
+        seed(mm, n)
+        copies = add_duplicates(mm, rng)
+
+        started = time.perf_counter()
+        plans = model.dedup.find(mm)
+        seconds = time.perf_counter() - started
+
+        merged = {id for plan in plans for id in plan.merge}
+        print(f"dedup n={n}: {seconds:.1f} s, {len(plans)} plans, {len(merged)} merged, "
+              f"{len(copies & merged)}/{len(copies)} planted duplicates found")
+
+        with mm.db.cursor() as curs:
+            curs.execute("DELETE FROM phones WHERE contact_id = ANY(%s)", (list(copies),))
+            curs.execute("DELETE FROM contacts WHERE id = ANY(%s)", (list(copies),))
+        mm.db.commit()
+
+if __name__ == "__main__":
+    main()
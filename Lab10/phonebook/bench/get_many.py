@@ -0,0 +1,16 @@
+import model
+import model.contact
+from bench import install, measure
+
+PAGE_SIZES = [10, 100, 1000]
+
+def main():
+    mm = model.ModelManager()
+    install(mm)
+
+    for limit in PAGE_SIZES:
+        filters = model.contact.GetManyFilters(limit=limit, offset=0)
+        print(measure(f"get_many limit={limit}", lambda: model.contact.get_many(mm, filters)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import model
+import model.contact
+from bench import install, measure, seed
+
+PAGE_SIZE = 20
+PAGES = [1, 1_000, 10_000]
+
+def boundary_id(mm, page: int) -> int:
+    with mm.db.cursor() as curs:
+        curs.execute("SELECT id FROM contacts ORDER BY id OFFSET %s LIMIT 1",
+                      ((page - 1) * PAGE_SIZE - 1,))
+        return curs.fetchone()[0]
+
+def main():
+    mm = model.ModelManager()
+    seed(mm, PAGE_SIZE * max(PAGES) + PAGE_SIZE)
+    install(mm)
+
+    for page in PAGES:
+        offset = model.contact.GetManyFilters(PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+        print(measure(f"offset page={page}", lambda: model.contact.get_page(mm, offset)))
+
+        after = None
+        if page > 1:
+            id = boundary_id(mm, page)
+            after = model.contact.encode_after(id, id)
+        keyset = model.contact.GetManyFilters(PAGE_SIZE, after=after)
+        print(measure(f"keyset page={page}", lambda: model.contact.get_page(mm, keyset)))
+
+if __name__ == "__main__":
+    main()
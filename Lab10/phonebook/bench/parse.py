@@ -0,0 +1,43 @@
+import csv
+import os
+import tempfile
+import time
+from pathlib import Path
+import model.importer
+import model.parallel_import
+
+ROWS = 1_000_000
+
+def write_csv(path: Path, n: int) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(["first_name", "last_name", "phones"])
+        for i in range(n):
+            # Every 100th row has a quoted field with a newline in it.
+            last_name = f"Smith\n{i}" if i % 100 == 0 else f"Smith{i}"
+            writer.writerow([f"John{i}", last_name, f"+7 707 {i:07d};8 701 {i:07d}"])
+
+def rate(name: str, n: int, seconds: float) -> None:
+    print(f"{name:<40} {n / seconds:>14,.0f} rows/s")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "contacts.csv"
+        write_csv(path, ROWS)
+
+        started = time.perf_counter()
+        with open(path, newline='') as file:
+            batches = model.importer.validated(model.importer.read_rows(file))
+            n = sum(len(valid) + len(rejects) for valid, rejects in batches)
+        rate("sequential", n, time.perf_counter() - started)
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            started = time.perf_counter()
+            batches = model.parallel_import.parse(path, workers, ordered=False)
+            n = sum(len(valid) + len(rejects) for valid, rejects in batches)
+            rate(f"parallel workers={workers}", n, time.perf_counter() - started)
+            workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import model
+import model.contact
+import model.phone
+from bench import install, measure, seed
+
+REPEAT = 1000
+
+def lookups(mm):
+    return {
+        "phone.exist": lambda: model.phone.exist(mm, "77071772020"),
+        "phone.get_by_contact": lambda: model.phone.get_by_contact(mm, 1),
+        "contact.get": lambda: model.contact.get(mm, 1),
+        "contact.get_many": lambda: model.contact.get_many(mm, model.contact.GetManyFilters(20)),
+    }
+
+def main():
+    mm = model.ModelManager()
+    seed(mm, 10_000)
+    install(mm)
+
+    for name, f in lookups(mm).items():
+        mm.db.prepared = None
+        plain = measure(f"{name} plain", f, REPEAT)
+        mm.db.prepared = set()
+        prepared = measure(f"{name} prepared", f, REPEAT)
+        print(plain)
+        print(prepared)
+        print(f"{'saved per call':<40} {(plain.seconds - prepared.seconds) * 1e6:>24.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import model
+import model.contact
+import model.schema
+from bench import install, measure, seed
+
+SCALES = [10_000, 100_000, 1_000_000]
+PATTERNS = ["cristiano", "lionl mesi", "tay swft"]
+
+def main():
+    mm = model.ModelManager()
+    model.schema.migrate(mm)
+
+    for n in SCALES:
+        seed(mm, n)
+        with mm.db.cursor() as curs:
+            curs.execute("ANALYZE contacts")
+        mm.db.commit()
+
+        install(mm)
+        for pattern in PATTERNS:
+            filters = model.contact.GetManyFilters(limit=20, pattern=pattern)
+            print(measure(f"search n={n} {pattern!r}", lambda: model.contact.get_many(mm, filters)))
+
+if __name__ == "__main__":
+    main()
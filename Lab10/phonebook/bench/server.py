@@ -0,0 +1,60 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+import psycopg2
+
+DBNAME = "phonebook_bench"
+
+def _bin(name: str) -> str:
+    bindir = os.environ.get("PG_BIN")
+    if bindir:
+        return os.path.join(bindir, name)
+    found = shutil.which(name)
+    if found:
+        return found
+    pg_config = shutil.which("pg_config")
+    if pg_config:
+        bindir = subprocess.check_output([pg_config, "--bindir"], text=True).strip()
+        return os.path.join(bindir, name)
+    raise RuntimeError(f"{name} not found: put the PostgreSQL binaries on PATH or set PG_BIN")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def temp_server() -> Iterator[str]:
+    # Throwaway cluster in a temporary directory, reachable only through a
+    # unix socket there. Yields the path of a config file for config.load.
+    with tempfile.TemporaryDirectory(prefix="pb-") as tmp:
+        data = os.path.join(tmp, "data")
+        subprocess.run(
+            [_bin("initdb"), "-D", data, "-U", "postgres", "-A", "trust", "-E", "UTF8", "--no-sync"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+        port = _free_port()
+        subprocess.run(
+            [_bin("pg_ctl"), "-D", data, "-w", "-l", os.path.join(tmp, "server.log"),
+             "-o", f"-k {tmp} -p {port} -c listen_addresses=''", "start"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        try:
+            conn = psycopg2.connect(host=tmp, port=port, user="postgres", dbname="postgres")
+            conn.autocommit = True
+            with conn.cursor() as curs:
+                curs.execute(f"CREATE DATABASE {DBNAME}")
+            conn.close()
+
+            path = os.path.join(tmp, "bench.ini")
+            with open(path, "w") as file:
+                file.write(f"[postgresql]\nhost={tmp}\nport={port}\nuser=postgres\ndbname={DBNAME}\n")
+            yield path
+        finally:
+            subprocess.run([_bin("pg_ctl"), "-D", data, "-w", "-m", "fast", "stop"],
+                           stdout=subprocess.DEVNULL)
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator
+
+import model
+from bench import create_schema, seed
+from bench.server import temp_server
+
+CONTACTS = 10_000
+RUNS = 5
+# How long a run waits for the first rows before giving up on them.
+DEADLINE = 3.0
+CONNECT_TIMEOUT = 2
+
+def child() -> None:
+    # Reports wall-clock marks; the parent subtracts its own start time, so
+    # interpreter startup and imports count too.
+    marks = {}
+    from view.app import PhonebookApp
+    from view.contact_table import ContactTable
+    marks['imported'] = time.time()
+
+    class Probe(PhonebookApp):
+        def on_mount(self) -> None:
+            self.call_after_refresh(self.first_frame)
+
+        def first_frame(self) -> None:
+            marks['first_frame'] = time.time()
+            self.set_interval(0.005, self.check)
+
+        def check(self) -> None:
+            if self.query_one(ContactTable).total > 0:
+                marks['first_rows'] = time.time()
+                self.exit()
+            elif time.time() - marks['first_frame'] > DEADLINE:
+                self.exit()
+
+    Probe().run(headless=True)
+    marks['exited'] = time.time()
+    print(json.dumps(marks))
+
+@contextmanager
+def silent_server() -> Iterator[int]:
+    # Accepts TCP connections but never answers, like a server behind a
+    # dead link: the client hangs until connect_timeout.
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        yield sock.getsockname()[1]
+
+def run_child(env: Dict[str, str]) -> Dict[str, float]:
+    clean = {name: value for name, value in os.environ.items()
+             if name != model.CONFIG_ENV and not name.startswith(model.PARAM_ENV_PREFIX)}
+    started = time.time()
+    out = subprocess.run([sys.executable, "-m", "bench.startup", "--child"],
+                         env={**clean, **env}, capture_output=True, text=True, check=True)
+    marks = json.loads(out.stdout.strip().splitlines()[-1])
+    return {name: at - started for name, at in marks.items()}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Phonebook time to first frame")
+    parser.add_argument("--config", help="use an existing database instead of a temporary one")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    server = nullcontext(args.config) if args.config else temp_server()
+    with server as ini, silent_server() as port:
+        model.configure(ini)
+        mm = model.ModelManager()
+        create_schema(mm)
+        seed(mm, CONTACTS)
+        mm.close()
+
+        prefix = model.PARAM_ENV_PREFIX
+        scenarios = {
+            "reachable": {model.CONFIG_ENV: ini},
+            "unreachable": {
+                f"{prefix}HOST": "127.0.0.1",
+                f"{prefix}PORT": str(port),
+                f"{prefix}DBNAME": "phonebook",
+                f"{prefix}CONNECT_TIMEOUT": str(CONNECT_TIMEOUT),
+            },
+        }
+        print(f"{'':<12} {'imported':>10} {'first frame':>12} {'first rows':>11}  (median of {args.runs}, s)")
+        for name, env in scenarios.items():
+            runs = [run_child(env) for _ in range(args.runs)]
+            def median(mark: str) -> str:
+                values = [run[mark] for run in runs if mark in run]
+                return f"{statistics.median(values):.3f}" if len(values) == len(runs) else "-"
+            print(f"{name:<12} {median('imported'):>10} {median('first_frame'):>12} {median('first_rows'):>11}")
+
+if __name__ == "__main__":
+    main()
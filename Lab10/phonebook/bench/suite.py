@@ -0,0 +1,163 @@
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List
+
+import model
+import model.schema
+from bench import analyze, create_schema, sample_ids, seed
+from bench.server import temp_server
+from model import contact
+from model.backend import SQLITE
+from model.contact import ContactForCreate, ContactForUpdate, GetManyFilters
+
+SCALES = [10_000, 100_000, 1_000_000]
+REPEAT = 200
+TOLERANCE = 0.2
+
+def summarize(samples: List[float]) -> Dict:
+    ms = sorted(s * 1000 for s in samples)
+    def pct(q: float) -> float:
+        return ms[min(len(ms) - 1, int(q * len(ms)))]
+    return {
+        'n': len(ms),
+        'mean_ms': statistics.fmean(ms),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
+
+def timed(f: Callable, args: Iterable) -> Dict:
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        f(arg)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def run_scale(mm, n: int, repeat: int, fuzzy: bool) -> Dict[str, Dict]:
+    seed(mm, n)
+    analyze(mm)
+
+    rnd = random.Random(n)
+    results = {}
+    created: List[int] = []
+
+    results['create'] = timed(
+        lambda i: created.append(contact.create(mm, ContactForCreate(
+            f"Bench{i}", "Create", f"9{i:08d}"))),
+        range(repeat))
+    results['create_or_replace'] = timed(
+        lambda i: created.append(contact.create_or_replace(mm, ContactForCreate(
+            f"Replace{i % max(1, repeat // 2)}", "Create", f"8{i:08d}"))),
+        range(repeat))
+    results['get'] = timed(
+        lambda id: contact.get(mm, id),
+        sample_ids(mm, repeat))
+    results['get_many'] = timed(
+        lambda offset: contact.get_many(mm, GetManyFilters(20, offset)),
+        [rnd.randrange(0, n, 20) for _ in range(repeat)])
+    results['get_many_keyset'] = timed(
+        lambda id: contact.get_many(mm, GetManyFilters(20, after=contact.encode_after(id, id))),
+        [rnd.randint(1, n) for _ in range(repeat)])
+    if fuzzy:
+        names = ["cristiano", "lionl mesi", "tay swft", "dana3 trump", "erlan neeson"]
+        results['get_many_fuzzy'] = timed(
+            lambda pattern: contact.get_many(mm, GetManyFilters(20, pattern=pattern)),
+            [rnd.choice(names) for _ in range(repeat)])
+
+    created = list(dict.fromkeys(created))
+    results['update'] = timed(
+        lambda i: contact.update(mm, ContactForUpdate(
+            created[i], "Renamed", None, [f"6{i:08d}"], [], [])),
+        range(len(created)))
+    results['delete'] = timed(lambda id: contact.delete(mm, id), created)
+    return results
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> bool:
+    ok = True
+    for scale, ops in results['scales'].items():
+        for op, stats in ops.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(op)
+            if base is None:
+                continue
+            ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] > 0 else 1.0
+            mark = ""
+            if ratio > 1 + tolerance:
+                mark = "  REGRESSION"
+                ok = False
+            print(f"{scale:>9} {op:<20} {base['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms  x{ratio:.2f}{mark}")
+    return ok
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Phonebook model benchmarks")
+    parser.add_argument("--config", help="benchmark an existing database instead of a temporary one")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="benchmark the embedded SQLite backend on this database file")
+    parser.add_argument("--denormalized", action="store_true",
+                        help="read phones from the denormalized contact columns")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--baseline", help="earlier --out file to compare with")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed relative p50 slowdown before failing")
+    args = parser.parse_args()
+    if args.sqlite and args.denormalized:
+        parser.error("--denormalized needs Postgres")
+
+    if args.sqlite:
+        server = nullcontext(None)
+    else:
+        server = nullcontext(args.config) if args.config else temp_server()
+    with server as ini:
+        if ini is not None:
+            model.configure(ini)
+        mm = model.ModelManager(sqlite=args.sqlite)
+        fuzzy = create_schema(mm)
+        if args.denormalized:
+            model.schema.denormalize(mm)
+            mm.denormalized = True
+
+        if mm.backend == SQLITE:
+            server_version = sqlite3.sqlite_version
+        else:
+            with mm.db.cursor() as curs:
+                curs.execute("SHOW server_version")
+                server_version = curs.fetchone()[0]
+            mm.db.commit()
+
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'backend': mm.backend,
+                'denormalized': mm.denormalized,
+                'server_version': server_version,
+                'repeat': args.repeat,
+                'started': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            'scales': {},
+        }
+        for n in sorted(args.scales):
+            print(f"scale {n}...", file=sys.stderr)
+            results['scales'][str(n)] = run_scale(mm, n, args.repeat, fuzzy)
+        mm.close()
+
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
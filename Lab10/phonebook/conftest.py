@@ -0,0 +1,60 @@
+import os
+import subprocess
+from typing import Iterator, Tuple
+import psycopg2
+import pytest
+
+import model
+import model.schema
+from model.backend import POSTGRES, SQLITE
+
+# Tests that take mm run once per backend. Postgres uses the database named
+# by this config file if set, otherwise a throwaway server from
+# bench.server; without either, those runs are skipped.
+TEST_CONFIG_ENV = "PHONEBOOK_TEST_CONFIG"
+
+@pytest.fixture(scope="session")
+def postgres() -> Iterator[Tuple[str, bool]]:
+    # Yields the config path and whether fuzzy search is available.
+    from bench import create_schema
+    from bench.server import temp_server
+
+    def prepare(path: str) -> Tuple[str, bool]:
+        model.configure(path)
+        with model.ModelManager() as mm:
+            return path, create_schema(mm)
+
+    path = os.environ.get(TEST_CONFIG_ENV)
+    if path is not None:
+        yield prepare(path)
+        return
+    try:
+        server = temp_server()
+        path = server.__enter__()
+    except (RuntimeError, OSError, subprocess.CalledProcessError, psycopg2.Error) as error:
+        pytest.skip(f"no Postgres server: {error}")
+    try:
+        yield prepare(path)
+    finally:
+        server.__exit__(None, None, None)
+
+@pytest.fixture(params=[SQLITE, POSTGRES])
+def mm(request, tmp_path) -> Iterator[model.ModelManager]:
+    if request.param == SQLITE:
+        manager = model.ModelManager(sqlite=str(tmp_path / "phonebook.db"))
+        model.schema.create(manager)
+    else:
+        path, _ = request.getfixturevalue("postgres")
+        model.configure(path)
+        manager = model.ModelManager()
+        with manager.db.cursor() as curs:
+            curs.execute("TRUNCATE contacts, phones, import_checkpoints RESTART IDENTITY")
+        manager.db.commit()
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def fuzzy(request, mm) -> None:
+    # For tests of fuzzy search, which needs pg_trgm on Postgres.
+    if mm.backend == POSTGRES and not request.getfixturevalue("postgres")[1]:
+        pytest.skip("pg_trgm is not available")
@@ -1,16 +1,165 @@
 import config
+import os
 import psycopg2
+import sqlite3
 import sys
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Union
+from .backend import POSTGRES, SQLITE
+from .errors import ModelError
+from .pool import ConnectionPool
+from .prepared import Connection
+from .stats import InstrumentedCursor
 
-try:
-    CONFIG = config.load(sys.argv[1])
-except:
-    raise Exception("Expected config filename as first argument.")
+if TYPE_CHECKING:
+    from .cache import ModelCache
+    from .phone_filter import PhoneFilter
+    from .search import SearchIndex
+
+# Connection parameters are resolved on first use, later sources winning:
+# the config file (configure(path), else $PHONEBOOK_CONFIG, else argv[1] if
+# it is a file), then PHONEBOOK_PG_<PARAM> environment variables, then
+# configure(**params).
+CONFIG_ENV = "PHONEBOOK_CONFIG"
+PARAM_ENV_PREFIX = "PHONEBOOK_PG_"
+# A database file path here, or passed as configure(sqlite=...), selects the
+# embedded SQLite backend instead of a Postgres server.
+SQLITE_ENV = "PHONEBOOK_SQLITE"
+
+_config: Optional[Dict] = None
+_config_path: Optional[str] = None
+_config_params: Dict = {}
+_config_sqlite: Optional[str] = None
+_config_lock = threading.Lock()
+
+def configure(path: Optional[str] = None, sqlite: Optional[str] = None, **params) -> None:
+    # Has to come before the first connection; the pool keeps what it got.
+    global _config, _config_path, _config_params, _config_sqlite
+    with _config_lock:
+        _config = None
+        _config_path = path
+        _config_params = params
+        _config_sqlite = sqlite
+
+def sqlite_path() -> Optional[str]:
+    return _config_sqlite or os.environ.get(SQLITE_ENV)
+
+def _resolve() -> Dict:
+    path = _config_path or os.environ.get(CONFIG_ENV)
+    if path is None and len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
+        path = sys.argv[1]
+    resolved = {}
+    if path is not None:
+        try:
+            resolved = config.load(path)
+        except Exception as error:
+            raise ModelError(f"cannot read database config: {error}")
+    for name, value in os.environ.items():
+        if name.startswith(PARAM_ENV_PREFIX):
+            resolved[name[len(PARAM_ENV_PREFIX):].lower()] = value
+    resolved.update(_config_params)
+    if not resolved:
+        raise ModelError(f"no database config: call model.configure(), set {CONFIG_ENV} "
+                         "or pass a config file as the first argument")
+    return resolved
+
+def get_config() -> Dict:
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = _resolve()
+        return _config
+
+POOL_SIZE = 4
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool({
+                **get_config(),
+                'connection_factory': Connection,
+                'cursor_factory': InstrumentedCursor,
+            }, maxconn=POOL_SIZE)
+        return _pool
 
 class ModelManager:
-    def __init__(self) -> None:
-        self.db = psycopg2.connect(**CONFIG)
+    # A Postgres connection, from pool if given, or an SQLite database file;
+    # the model functions dispatch on backend.
+    def __init__(self, pool: Optional[ConnectionPool] = None, sqlite: Optional[str] = None) -> None:
+        self.pool = pool
+        self.sqlite = sqlite
+        self.backend = SQLITE if sqlite is not None else POSTGRES
+        # Kept in sync by contact.create/update/delete when set.
+        self.search_index: Optional["SearchIndex"] = None
+        # Read-through cache for contact.get and phone.get_by_contact.
+        self.cache: Optional["ModelCache"] = None
+        # Lets phone.exist skip the query for numbers known to be absent.
+        self.phone_filter: Optional["PhoneFilter"] = None
+        # Read phones from contacts.phone_ids/phone_nums, which
+        # schema.denormalize() adds. Postgres only.
+        self.denormalized = False
+        self._db: Optional[Union[Connection, sqlite3.Connection]] = None
+
+    @property
+    def db(self) -> Connection:
+        # Connects on first use, so that creating a ModelManager never waits
+        # for the server.
+        if self._db is None:
+            try:
+                if self.sqlite is not None:
+                    from .sqlite import connect
+                    self._db = connect(self.sqlite)
+                elif self.pool is not None:
+                    self._db = self.pool.getconn()
+                else:
+                    self._db = psycopg2.connect(**get_config(), connection_factory=Connection,
+                                                cursor_factory=InstrumentedCursor)
+            except (psycopg2.OperationalError, sqlite3.Error) as error:
+                raise ModelError(f"cannot connect to the database: {error}".strip()) from error
+        return self._db
+
+    @property
+    def connected(self) -> bool:
+        if self._db is None:
+            return False
+        return self.backend == SQLITE or not self._db.closed
+
+    def cancel(self) -> None:
+        # Aborts the statement in flight; may be called from another thread.
+        if self._db is None:
+            return
+        if self.backend == SQLITE:
+            self._db.interrupt()
+        else:
+            self._db.cancel()
+
+    @classmethod
+    def pooled(cls) -> "ModelManager":
+        # SQLite connections are cheap to open, so they are not pooled.
+        path = sqlite_path()
+        if path is not None:
+            return cls(sqlite=path)
+        return cls(get_pool())
+
+    def close(self) -> None:
+        db = getattr(self, '_db', None)
+        if db is None:
+            return
+        self._db = None
+        if self.pool is not None:
+            self.pool.putconn(db)
+        else:
+            db.close()
+
+    def __enter__(self) -> "ModelManager":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
         
     def __del__(self) -> None:
-        self.db.close()
-
+        self.close()
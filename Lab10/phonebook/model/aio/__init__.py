@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+import psycopg2
+import sqlite3
+from .. import ModelManager
+from ..errors import ModelError
+
+T = TypeVar('T')
+
+class _Job:
+    def __init__(self) -> None:
+        self.started = False
+        self.done = False
+        self.cancelled = False
+
+class AsyncModelManager:
+    # Connections must not be used from two threads at once, so all
+    # calls run one at a time on a dedicated worker thread that owns the
+    # ModelManager.
+    def __init__(self, factory: Callable[[], ModelManager] = ModelManager.pooled) -> None:
+        self._factory = factory
+        self._mm: Optional[ModelManager] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self._lock = threading.Lock()
+
+    def _call(self, job: _Job, f: Callable[..., T], args, kwargs) -> Optional[T]:
+        with self._lock:
+            if job.cancelled:
+                return None
+            job.started = True
+
+        try:
+            if self._mm is None:
+                self._mm = self._factory()
+            return f(self._mm, *args, **kwargs)
+        except (psycopg2.Error, sqlite3.Error) as error:
+            self._rollback()
+            # Callers only have to handle ModelError: an overlong value or a
+            # cancelled statement is reported, not a crash.
+            raise ModelError(str(error).strip() or type(error).__name__) from error
+        except BaseException:
+            self._rollback()
+            raise
+        finally:
+            with self._lock:
+                job.done = True
+
+    def _rollback(self) -> None:
+        if self._mm is not None and self._mm.connected:
+            try:
+                self._mm.db.rollback()
+            except (psycopg2.Error, sqlite3.Error):
+                pass
+
+    async def run(self, f: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        job = _Job()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(self._call, job, f, args, kwargs))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Under the lock, so the worker can neither finish this job nor
+            # start the next one before the cancel is sent: it must only
+            # ever abort this job's statement.
+            with self._lock:
+                job.cancelled = True
+                if job.started and not job.done and self._mm is not None and self._mm.connected:
+                    # Aborts the statement in flight; the worker rolls back.
+                    self._mm.cancel()
+            raise
+
+    async def commit(self) -> None:
+        await self.run(lambda mm: mm.db.commit())
+
+    async def rollback(self) -> None:
+        await self.run(lambda mm: mm.db.rollback())
+
+    def progress(self, callback: Callable[..., None]) -> Callable[..., None]:
+        # Wraps a callback so that calls from the worker thread are delivered
+        # on the event loop instead.
+        loop = asyncio.get_running_loop()
+        return lambda *args: loop.call_soon_threadsafe(callback, *args)
+
+    async def close(self) -> None:
+        def close(mm: ModelManager) -> None:
+            mm.close()
+            self._mm = None
+        if self._mm is not None:
+            await self.run(close)
+        self._executor.shutdown(wait=False)
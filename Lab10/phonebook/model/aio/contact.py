@@ -0,0 +1,34 @@
+from typing import List, Optional
+from .. import contact
+from ..contact import Contact, ContactForCreate, ContactForUpdate, ContactPage, GetManyFilters
+from . import AsyncModelManager
+
+async def create(amm: AsyncModelManager, c: ContactForCreate) -> int:
+    return await amm.run(contact.create, c)
+
+async def create_or_replace(amm: AsyncModelManager, c: ContactForCreate) -> int:
+    return await amm.run(contact.create_or_replace, c)
+
+async def get(amm: AsyncModelManager, id: int) -> Contact:
+    return await amm.run(contact.get, id)
+
+async def get_by_phone(amm: AsyncModelManager, num: str) -> Optional[Contact]:
+    return await amm.run(contact.get_by_phone, num)
+
+async def find_by_phone_suffix(amm: AsyncModelManager, suffix: str, limit: int = 50) -> List[Contact]:
+    return await amm.run(contact.find_by_phone_suffix, suffix, limit)
+
+async def get_page(amm: AsyncModelManager, filters: GetManyFilters) -> ContactPage:
+    return await amm.run(contact.get_page, filters)
+
+async def count(amm: AsyncModelManager) -> int:
+    return await amm.run(contact.count)
+
+async def get_many(amm: AsyncModelManager, filters: GetManyFilters) -> List[Contact]:
+    return await amm.run(contact.get_many, filters)
+
+async def update(amm: AsyncModelManager, c: ContactForUpdate) -> None:
+    await amm.run(contact.update, c)
+
+async def delete(amm: AsyncModelManager, id: int) -> None:
+    await amm.run(contact.delete, id)
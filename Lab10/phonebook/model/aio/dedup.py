@@ -0,0 +1,10 @@
+from typing import List
+from .. import dedup
+from ..dedup import THRESHOLD, MergePlan
+from . import AsyncModelManager
+
+async def find(amm: AsyncModelManager, threshold: float = THRESHOLD) -> List[MergePlan]:
+    return await amm.run(dedup.find, threshold)
+
+async def apply(amm: AsyncModelManager, plans: List[MergePlan]) -> int:
+    return await amm.run(dedup.apply, plans)
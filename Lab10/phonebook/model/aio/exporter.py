@@ -0,0 +1,7 @@
+from pathlib import Path
+from .. import exporter
+from ..exporter import ITERSIZE
+from . import AsyncModelManager
+
+async def export_csv(amm: AsyncModelManager, path: Path, itersize: int = ITERSIZE) -> int:
+    return await amm.run(exporter.export_csv, path, itersize)
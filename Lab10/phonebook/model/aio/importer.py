@@ -0,0 +1,11 @@
+from pathlib import Path
+from typing import Optional
+from .. import importer
+from ..importer import CHUNK_SIZE, ImportReport, Progress
+from . import AsyncModelManager
+
+async def import_csv(amm: AsyncModelManager, path: Path, chunk_size: int = CHUNK_SIZE,
+                     progress: Optional[Progress] = None) -> ImportReport:
+    if progress is not None:
+        progress = amm.progress(progress)
+    return await amm.run(importer.import_csv, path, chunk_size, progress)
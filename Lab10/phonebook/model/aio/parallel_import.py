@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from pathlib import Path
+from typing import Optional
+from .. import parallel_import
+from ..parallel_import import CHUNK_BYTES
+from ..importer import CHUNK_SIZE, ImportReport, Progress
+from . import AsyncModelManager
+
+async def import_csv(amm: AsyncModelManager, path: Path, workers: Optional[int] = None,
+                     ordered: bool = True, chunk_size: int = CHUNK_SIZE,
+                     progress: Optional[Progress] = None) -> ImportReport:
+    if progress is not None:
+        progress = amm.progress(progress)
+    return await amm.run(parallel_import.import_csv, path, workers, ordered, chunk_size, progress)
+
+async def import_resumable(amm: AsyncModelManager, path: Path, workers: Optional[int] = None,
+                           chunk_size: int = CHUNK_SIZE, chunk_bytes: int = CHUNK_BYTES,
+                           progress: Optional[Progress] = None) -> ImportReport:
+    if progress is not None:
+        progress = amm.progress(progress)
+    # Cancelling only aborts the statement in flight; the import would go
+    # on with the next span and hold up every other call meanwhile.
+    stop = threading.Event()
+    try:
+        return await amm.run(parallel_import.import_resumable, path, workers, chunk_size,
+                             chunk_bytes, progress, stop)
+    except asyncio.CancelledError:
+        stop.set()
+        raise
@@ -0,0 +1,22 @@
+from typing import List
+from .. import phone
+from ..phone import Phone, PhoneForCreate
+from . import AsyncModelManager
+
+async def create(amm: AsyncModelManager, p: PhoneForCreate) -> int:
+    return await amm.run(phone.create, p)
+
+async def get_by_contact(amm: AsyncModelManager, contact_id: int) -> List[Phone]:
+    return await amm.run(phone.get_by_contact, contact_id)
+
+async def exist(amm: AsyncModelManager, num: str) -> bool:
+    return await amm.run(phone.exist, num)
+
+async def update(amm: AsyncModelManager, p: Phone) -> None:
+    await amm.run(phone.update, p)
+
+async def delete(amm: AsyncModelManager, id: int) -> None:
+    await amm.run(phone.delete, id)
+
+async def delete_by_contact(amm: AsyncModelManager, contact_id: int) -> None:
+    await amm.run(phone.delete_by_contact, contact_id)
@@ -0,0 +1,29 @@
+import functools
+import importlib
+from typing import Callable, TypeVar
+from .errors import ModelError
+
+POSTGRES = "postgres"
+SQLITE = "sqlite"
+
+F = TypeVar('F', bound=Callable)
+
+@functools.lru_cache(maxsize=None)
+def _implementation(backend: str, module: str, name: str) -> Callable:
+    try:
+        return getattr(importlib.import_module(f".{backend}.{module}", __package__), name)
+    except (ModuleNotFoundError, AttributeError):
+        raise ModelError(f"{module}.{name} is not supported by the {backend} backend")
+
+def dispatch(f: F) -> F:
+    # The decorated function is the Postgres implementation. Other backends
+    # provide one with the same name in model/<backend>/<module>.py, taking
+    # the same arguments.
+    module = f.__module__.rsplit('.', 1)[-1]
+
+    @functools.wraps(f)
+    def wrapper(mm, *args, **kwargs):
+        if mm.backend == POSTGRES:
+            return f(mm, *args, **kwargs)
+        return _implementation(mm.backend, module, f.__name__)(mm, *args, **kwargs)
+    return wrapper  # type: ignore
@@ -0,0 +1,138 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+class LRUCache(Generic[K, V]):
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 60.0,
+                 on_evict: Optional[Callable[[K, V], None]] = None,
+                 lock: Optional[threading.RLock] = None) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[K, tuple]" = OrderedDict()
+        self._stats = CacheStats()
+        self._lock = lock or threading.RLock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._drop(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self._stats.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+                self._stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._data):
+                self._drop(key)
+
+    def _drop(self, key: K) -> None:
+        value, _ = self._data.pop(key)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**{**self._stats.__dict__, 'size': len(self._data)})
+
+class ModelCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 60.0) -> None:
+        # One lock for both caches and the owner maps: eviction callbacks run
+        # under the cache lock and update the maps.
+        self._lock = threading.RLock()
+        self.contacts: LRUCache[int, object] = LRUCache(
+            maxsize, ttl, lambda id, contact: self._forget(self._contact_owners, contact.phones), self._lock)
+        self.phones: LRUCache[int, List] = LRUCache(
+            maxsize, ttl, lambda id, phones: self._forget(self._phone_owners, phones), self._lock)
+        # Phone id -> contact id for every cached phone, so that writes by
+        # phone id can find the entries they make stale.
+        self._contact_owners: Dict[int, int] = {}
+        self._phone_owners: Dict[int, int] = {}
+
+    def _remember(self, owners: Dict[int, int], contact_id: int, phones: List) -> None:
+        for phone in phones:
+            owners[phone.id] = contact_id
+
+    def _forget(self, owners: Dict[int, int], phones: List) -> None:
+        for phone in phones:
+            owners.pop(phone.id, None)
+
+    def get_contact(self, id: int):
+        # Copies keep callers from mutating what other callers will read.
+        return copy.deepcopy(self.contacts.get(id))
+
+    def put_contact(self, contact) -> None:
+        contact = copy.deepcopy(contact)
+        with self._lock:
+            self.contacts.put(contact.id, contact)
+            self._remember(self._contact_owners, contact.id, contact.phones)
+
+    def get_phones(self, contact_id: int) -> Optional[List]:
+        return copy.deepcopy(self.phones.get(contact_id))
+
+    def put_phones(self, contact_id: int, phones: List) -> None:
+        phones = copy.deepcopy(phones)
+        with self._lock:
+            self.phones.put(contact_id, phones)
+            self._remember(self._phone_owners, contact_id, phones)
+
+    def invalidate_contact(self, id: int) -> None:
+        with self._lock:
+            self.contacts.invalidate(id)
+            self.phones.invalidate(id)
+
+    def invalidate_phone(self, id: int) -> None:
+        with self._lock:
+            for owners in (self._contact_owners, self._phone_owners):
+                owner = owners.get(id)
+                if owner is not None:
+                    self.invalidate_contact(owner)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.contacts.clear()
+            self.phones.clear()
+
+    def stats(self) -> Dict[str, CacheStats]:
+        return {'contacts': self.contacts.stats(), 'phones': self.phones.stats()}
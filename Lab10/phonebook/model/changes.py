@@ -0,0 +1,208 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import psycopg2
+import psycopg2.extensions
+from . import ModelManager, get_config, sqlite_path
+from . import contact
+from .aio import AsyncModelManager
+from .cache import ModelCache
+from .errors import EntityNotExist, ModelError
+from .schema import CHANGES_CHANNEL
+
+RECONNECT_DELAY = 5.0
+
+@dataclass(frozen=True)
+class Change:
+    table: str
+    # None when any row of the table may have changed: a statement touched
+    # too many rows to name them, or notifications were missed.
+    id: Optional[int]
+    # 'I', 'U' or 'D'.
+    op: str
+    # The contact the row belongs to; for contacts, the id itself.
+    contact_id: Optional[int]
+
+Callback = Callable[[List[Change]], None]
+
+def parse(payload: str) -> Change:
+    table, id, op, *contact_id = payload.split(" ")
+    return Change(table, None if id == "*" else int(id), op,
+                  int(contact_id[0]) if contact_id else None)
+
+def invalidate(cache: ModelCache, changes: List[Change]) -> None:
+    for change in changes:
+        if change.id is None:
+            cache.clear()
+            return
+        if change.table == "phones":
+            cache.invalidate_phone(change.id)
+        if change.contact_id is not None:
+            cache.invalidate_contact(change.contact_id)
+
+def refresh(mm: ModelManager, changes: List[Change]) -> None:
+    # Brings what mm keeps in memory up to date with changes made through
+    # other connections: whichever of its cache, search index and phone
+    # filter are set by now.
+    if mm.cache is not None:
+        invalidate(mm.cache, changes)
+    everything = any(change.id is None for change in changes)
+
+    if mm.search_index is not None:
+        if everything:
+            mm.search_index.load(mm)
+        else:
+            for id in {change.contact_id for change in changes if change.contact_id is not None}:
+                try:
+                    contact._reindex(mm, id)
+                except EntityNotExist:
+                    mm.search_index.remove(id)
+
+    if mm.phone_filter is not None:
+        # Numbers are only ever added: removed ones are false positives.
+        if everything:
+            mm.phone_filter.load(mm)
+        else:
+            ids = [change.id for change in changes if change.table == "phones" and change.op != "D"]
+            if ids:
+                with mm.db.cursor() as curs:
+                    curs.execute("""
+                        SELECT phone_e164
+                        FROM phones
+                        WHERE id = ANY(%s) AND phone_e164 IS NOT NULL
+                    """, (ids,))
+                    for key, in curs.fetchall():
+                        mm.phone_filter.add(key)
+                mm.db.commit()
+
+class ChangeListener:
+    # LISTENs on a connection of its own, which the event loop watches with
+    # add_reader: nothing waits for notifications, and none are polled for.
+    # Each wakeup drains what has arrived and hands it to the subscribers
+    # as one list, on the event loop.
+    def __init__(self, reconnect_delay: float = RECONNECT_DELAY) -> None:
+        self.reconnect_delay = reconnect_delay
+        self._callbacks: List[Callback] = []
+        self._caches: List[ModelCache] = []
+        self._managers: List[AsyncModelManager] = []
+        self._conn: Optional[psycopg2.extensions.connection] = None
+        self._fd = -1
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._stopped = False
+
+    def subscribe(self, callback: Callback) -> None:
+        self._callbacks.append(callback)
+
+    def invalidates(self, cache: ModelCache) -> None:
+        self._caches.append(cache)
+
+    def refreshes(self, amm: AsyncModelManager) -> None:
+        # Runs refresh() on the manager's thread for each list of changes.
+        self._managers.append(amm)
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None
+
+    async def start(self) -> None:
+        if sqlite_path() is not None:
+            raise ModelError("change notifications need the Postgres backend")
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        try:
+            await self._connect()
+        except ModelError:
+            # Keeps trying, as after losing the connection: a database that
+            # is down for a moment at startup is no different.
+            self._schedule_reconnect()
+
+    def stop(self) -> None:
+        self._stopped = True
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        self._close()
+
+    def _open(self) -> psycopg2.extensions.connection:
+        try:
+            conn = psycopg2.connect(**get_config())
+        except psycopg2.OperationalError as error:
+            raise ModelError(f"cannot connect to the database: {error}".strip()) from error
+        # Notifications are only delivered between transactions.
+        conn.autocommit = True
+        with conn.cursor() as curs:
+            curs.execute(f"LISTEN {CHANGES_CHANNEL}")
+        return conn
+
+    async def _connect(self) -> None:
+        # Connecting blocks, so it happens on the default executor.
+        conn = await self._loop.run_in_executor(None, self._open)
+        if self._stopped:
+            conn.close()
+            return
+        self._conn = conn
+        self._fd = conn.fileno()
+        self._loop.add_reader(self._fd, self._read)
+
+    def _close(self) -> None:
+        if self._conn is None:
+            return
+        self._loop.remove_reader(self._fd)
+        self._conn.close()
+        self._conn = None
+
+    def _read(self) -> None:
+        try:
+            self._conn.poll()
+        except psycopg2.Error:
+            self._close()
+            self._schedule_reconnect()
+            return
+        notifies = list(self._conn.notifies)
+        self._conn.notifies.clear()
+        changes = []
+        for notify in notifies:
+            if notify.channel != CHANGES_CHANNEL:
+                continue
+            try:
+                changes.append(parse(notify.payload))
+            except ValueError:
+                # Someone else's NOTIFY on the channel.
+                continue
+        if changes:
+            self._dispatch(changes)
+
+    def _schedule_reconnect(self) -> None:
+        if self._stopped:
+            return
+        self._retry = self._loop.call_later(
+            self.reconnect_delay, lambda: asyncio.ensure_future(self._reconnect()))
+
+    async def _reconnect(self) -> None:
+        self._retry = None
+        try:
+            await self._connect()
+        except ModelError:
+            self._schedule_reconnect()
+            return
+        # Whatever happened while disconnected went unnoticed.
+        self._dispatch([Change("contacts", None, "U", None), Change("phones", None, "U", None)])
+
+    def _dispatch(self, changes: List[Change]) -> None:
+        for cache in self._caches:
+            invalidate(cache, changes)
+        for amm in self._managers:
+            self._loop.create_task(self._refresh(amm, changes))
+        for callback in self._callbacks:
+            callback(changes)
+
+    async def _refresh(self, amm: AsyncModelManager, changes: List[Change]) -> None:
+        if self._stopped:
+            return
+        try:
+            await amm.run(refresh, changes)
+        except ModelError:
+            # The cache is invalidated before anything can fail; the index
+            # and filter catch up with the next change.
+            pass
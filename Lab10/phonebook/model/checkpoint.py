@@ -0,0 +1,62 @@
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from . import ModelManager
+from .backend import dispatch
+
+BLOCK_BYTES = 1 << 20
+
+@dataclass
+class Checkpoint:
+    # A resumable import of the file with this hash has committed everything
+    # before byte offset, which is the start of the given line.
+    file_hash: str
+    offset: int
+    line: int
+    # Totals over all runs so far.
+    imported: int
+    rejected: int
+
+def file_hash(path: Path) -> str:
+    # Identifies the file by content, so a checkpoint is not applied to a
+    # file that was edited or replaced since, whatever its name.
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(BLOCK_BYTES)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+@dispatch
+def load(mm: ModelManager, file_hash: str) -> Optional[Checkpoint]:
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            SELECT file_hash, byte_offset, line, imported, rejected
+            FROM import_checkpoints
+            WHERE file_hash = %s
+        """, (file_hash,))
+        row = curs.fetchone()
+    return Checkpoint(*row) if row is not None else None
+
+@dispatch
+def save(mm: ModelManager, cp: Checkpoint) -> None:
+    # Not committed here: the checkpoint belongs in the transaction of the
+    # rows it accounts for.
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            INSERT INTO import_checkpoints (file_hash, byte_offset, line, imported, rejected)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (file_hash) DO UPDATE
+            SET byte_offset = EXCLUDED.byte_offset, line = EXCLUDED.line,
+                imported = EXCLUDED.imported, rejected = EXCLUDED.rejected,
+                updated_at = now()
+        """, (cp.file_hash, cp.offset, cp.line, cp.imported, cp.rejected))
+
+@dispatch
+def clear(mm: ModelManager, file_hash: str) -> None:
+    with mm.db.cursor() as curs:
+        curs.execute("DELETE FROM import_checkpoints WHERE file_hash = %s", (file_hash,))
+    mm.db.commit()
@@ -1,7 +1,15 @@
+import base64
+import json
+import math
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import psycopg2.errors
 from . import ModelManager
 from . import phone
+from . import prepared
+from .backend import dispatch
+from .errors import EntityAlreadyExist, EntityNotExist, ModelError, already_exist
+from .schema import NAME_EXPR, PHONES_DENORMALIZED, SUFFIX_EXPR
 
 @dataclass
 class Contact:
@@ -28,132 +36,340 @@ class ContactForUpdate:
 @dataclass
 class GetManyFilters:
     limit: int 
-    offset: int
+    offset: int = 0
     pattern: str = ""
     inc: bool = True
+    # Minimal trigram similarity of "first last" to pattern, from 0 to 1.
+    threshold: float = 0.3
+    # Token from a previous ContactPage; when set, offset is ignored.
+    after: Optional[str] = None
 
-class ModelError(Exception):
-    pass
-
-class EntityNotExist(ModelError):
-    def __init__(self, entity: str, id: int) -> None:
-        super().__init__(f"{entity} with id {id} does not exist")
-
-class EntityAlreadyExist(ModelError):
-    def __init__(self, entity: str, value, other_id: int) -> None:
-        super().__init__(f"{entity} with value {value} already exists at id {other_id}")
+@dataclass
+class ContactPage:
+    contacts: List[Contact]
+    after: Optional[str]
 
+@dispatch
 def create(mm: ModelManager, contact: ContactForCreate) -> int:
-    with mm.db.cursor() as curs:
-        curs.execute("""
-            INSERT INTO contacts(first_name, last_name)
-            VALUES (%s, %s)
-            RETURNING id;
-        """, (contact.first_name, contact.last_name))
-        row = curs.fetchone()
-        contact_id = row[0]
-    
-    phone.create(mm, phone.PhoneForCreate(
-        contact.phone_num,
-        contact_id
-    ))
+    try:
+        with mm.db.cursor() as curs:
+            prepared.execute(curs, """
+                INSERT INTO contacts(first_name, last_name)
+                VALUES (%s, %s)
+                RETURNING id;
+            """, (contact.first_name, contact.last_name))
+            row = curs.fetchone()
+            contact_id = row[0]
+        
+        phone.create(mm, phone.PhoneForCreate(
+            contact.phone_num,
+            contact_id
+        ))
+    except Exception:
+        mm.db.rollback()
+        raise
 
     mm.db.commit()
+
+    if mm.search_index is not None:
+        mm.search_index.add(contact_id, contact.first_name, contact.last_name, [contact.phone_num])
     return contact_id
 
+@dispatch
 def create_or_replace(mm: ModelManager, contact: ContactForCreate) -> int:
     if phone.exist(mm, contact.phone_num):
         raise EntityAlreadyExist("phone", contact.phone_num, 0) 
     
-    curs = mm.db.cursor()
-    curs.execute("""
-        call create_or_replace_contact(
-            row(%s, %s, %s)::contact_for_create,
-            null 
-        )
-    """, (contact.first_name, contact.last_name, contact.phone_num))
-    row = curs.fetchone()
-    contact_id = row[0]
+    # The filter behind phone.exist only knows this process's numbers, and
+    # another client can insert the number before the call, so the unique
+    # constraint still has the final say.
+    try:
+        with mm.db.cursor() as curs:
+            curs.execute("""
+                call create_or_replace_contact(
+                    row(%s, %s, %s)::contact_for_create,
+                    null
+                )
+            """, (contact.first_name, contact.last_name, contact.phone_num))
+            row = curs.fetchone()
+            contact_id = row[0]
+    except psycopg2.errors.UniqueViolation as error:
+        mm.db.rollback()
+        raise already_exist("phone", error)
+    except Exception:
+        mm.db.rollback()
+        raise
 
-    curs.close()
     mm.db.commit()
 
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact_id)
+
+    _reindex(mm, contact_id)
     return contact_id
 
+PHONES_LATERAL = """
+    CROSS JOIN LATERAL (
+        SELECT
+            COALESCE(ARRAY_AGG(p.id ORDER BY p.id), '{}') AS phone_ids,
+            COALESCE(ARRAY_AGG(p.phone_num ORDER BY p.id), '{}') AS phone_nums
+        FROM phones p
+        WHERE p.contact_id = c.id
+    ) ph
+"""
+
+def _phones(mm: ModelManager) -> Tuple[str, str]:
+    # Select list and join that give phone_ids and phone_nums of contact c.
+    if mm.denormalized:
+        return PHONES_DENORMALIZED, ""
+    return "ph.phone_ids, ph.phone_nums", PHONES_LATERAL
+
+def from_row(row) -> Contact:
+    id, first_name, last_name, phone_ids, phone_nums = row[:5]
+    phones = [phone.Phone(*p) for p in zip(phone_ids, phone_nums)]
+    return Contact(id, first_name, last_name, phones)
+
+def _reindex(mm: ModelManager, id: int) -> None:
+    if mm.search_index is not None:
+        contact = get(mm, id)
+        mm.search_index.add(id, contact.first_name, contact.last_name,
+                            [p.num for p in contact.phones])
+
+@dispatch
 def get(mm: ModelManager, id: int) -> Contact:
+    if mm.cache is not None:
+        cached = mm.cache.get_contact(id)
+        if cached is not None:
+            return cached
+
+    phones, join = _phones(mm)
     curs = mm.db.cursor()
-    curs.execute("""
-        SELECT first_name, last_name
-        FROM contacts
-        WHERE id = %s
+    prepared.execute(curs, f"""
+        SELECT c.id, c.first_name, c.last_name, {phones}
+        FROM contacts c
+        {join}
+        WHERE c.id = %s
     """, (id,))
     row = curs.fetchone()
-    first_name, last_name = row
-    phones = phone.get_by_contact(mm, id)
     curs.close()
-    return Contact(id, first_name, last_name, phones)
 
-def get_many(mm: ModelManager, filters: GetManyFilters) -> List[Contact]:
-    res = []
+    if row is None:
+        raise EntityNotExist("contact", id)
+
+    contact = from_row(row)
+    if mm.cache is not None:
+        mm.cache.put_contact(contact)
+    return contact
+
+@dispatch
+def get_by_phone(mm: ModelManager, num: str) -> Optional[Contact]:
+    phones, join = _phones(mm)
+    curs = mm.db.cursor()
+    prepared.execute(curs, f"""
+        SELECT c.id, c.first_name, c.last_name, {phones}
+        FROM phones p
+        JOIN contacts c ON c.id = p.contact_id
+        {join}
+        WHERE p.phone_e164 = %s
+    """, (phone.normalize(num),))
+    row = curs.fetchone()
+    curs.close()
+    return from_row(row) if row is not None else None
 
-    sql = "SELECT * FROM contacts\n"
+@dispatch
+def find_by_phone_suffix(mm: ModelManager, suffix: str, limit: int = 50) -> List[Contact]:
+    # Range operators rather than LIKE, so that the generic plan of the
+    # prepared statement still uses phones_e164_rev_idx.
+    low, high = phone.suffix_range(suffix)
+    phones, join = _phones(mm)
+    curs = mm.db.cursor()
+    prepared.execute(curs, f"""
+        SELECT c.id, c.first_name, c.last_name, {phones}
+        FROM contacts c
+        {join}
+        WHERE c.id IN (
+            SELECT contact_id
+            FROM phones
+            WHERE {SUFFIX_EXPR} ~>=~ %s AND {SUFFIX_EXPR} ~<~ %s
+        )
+        ORDER BY c.id
+        LIMIT %s
+    """, (low, high, limit))
+    rows = curs.fetchall()
+    curs.close()
+    return [from_row(row) for row in rows]
+
+def encode_after(rank, id: int) -> str:
+    raw = json.dumps([rank, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_after(token: str) -> Tuple[float, int]:
+    try:
+        rank, id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        # TypeError: valid JSON, but not a [rank, id] pair.
+        raise ModelError(f"invalid page token {token!r}")
+    # Checked here, as a bad value would otherwise reach the query: a
+    # DataError on Postgres, an empty page on SQLite. bool is an int too.
+    if isinstance(rank, bool) or not isinstance(rank, (int, float)) or not math.isfinite(rank):
+        raise ModelError(f"invalid page token {token!r}")
+    if isinstance(id, bool) or not isinstance(id, int) or not 0 <= id < 1 << 63:
+        raise ModelError(f"invalid page token {token!r}")
+    return rank, id
+
+@dispatch
+def get_page(mm: ModelManager, filters: GetManyFilters) -> ContactPage:
+    sql = "SELECT id, first_name, last_name, {denormalized}{rank} AS rank FROM contacts\n"
+    where = []
     
     pattern = filters.pattern.replace('%', '').replace('_', '')
     pattern = pattern.lower()
     params = {}
     if len(pattern) > 0:
-        sql += "WHERE LEVENSHTEIN(LOWER(first_name), %(pattern)s, 2, 1, 2) < 12\n"
-        sql += "ORDER BY SIMILARITY(LOWER(first_name), %(pattern)s) DESC\n"
-        params['pattern'] = f'%{pattern}%'
+        # Distance is 1 - SIMILARITY; ordering by it lets the GiST index
+        # return nearest neighbours directly.
+        rank = f"{NAME_EXPR} <-> %(pattern)s"
+        where.append(f"{NAME_EXPR} %% %(pattern)s")
+        order = "rank ASC, id ASC"
+        params['pattern'] = pattern
+        if filters.after is not None:
+            # The cast keeps the comparison in real, the type <-> returns.
+            where.append(f"""(
+                {rank} > %(after_rank)s::real
+                OR ({rank} = %(after_rank)s::real AND id > %(after_id)s)
+            )""")
     else:
-        if filters.inc:
-            sql += "ORDER BY id ASC\n"
-        else:
-            sql += "ORDER BY id DESC\n"
+        rank = "id"
+        order = "rank ASC" if filters.inc else "rank DESC"
+        if filters.after is not None:
+            where.append("id > %(after_id)s" if filters.inc else "id < %(after_id)s")
 
-    sql += f"LIMIT {filters.limit} OFFSET {filters.offset}\n"
+    if filters.after is not None:
+        params['after_rank'], params['after_id'] = decode_after(filters.after)
+        params['offset'] = 0
+    else:
+        params['offset'] = filters.offset
+    params['limit'] = filters.limit
+
+    sql = sql.format(rank=rank, denormalized="phone_ids, phone_nums, " if mm.denormalized else "")
+    if where:
+        sql += "WHERE " + " AND ".join(where) + "\n"
+    sql += f"ORDER BY {order}\n"
+    sql += "LIMIT %(limit)s OFFSET %(offset)s\n"
+
+    # Page first, then attach phones to the page rows only: one round trip
+    # per page instead of one per contact.
+    phones, join = _phones(mm)
+    sql = f"""
+        SELECT c.id, c.first_name, c.last_name, {phones}, c.rank
+        FROM ({sql}) c
+        {join}
+        ORDER BY {order}
+    """
+
+    before = None
+    if len(pattern) > 0:
+        # % compares against this setting; scope it to the transaction.
+        before = ("SELECT set_config('pg_trgm.similarity_threshold', %s, true)",
+                  [str(filters.threshold)])
 
     curs = mm.db.cursor()
-    curs.execute(sql, params)
-    for row in curs.fetchall():
-        id, first_name, last_name = row
-        phones = phone.get_by_contact(mm, id)
-        res.append(Contact(id, first_name, last_name, phones))
+    prepared.execute(curs, sql, params, before)
+    rows = curs.fetchall()
+    curs.close()
 
+    after = None
+    if len(rows) == filters.limit and len(rows) > 0:
+        last = rows[-1]
+        after = encode_after(last[5], last[0])
+    return ContactPage([from_row(row) for row in rows], after)
+
+@dispatch
+def count(mm: ModelManager) -> int:
+    curs = mm.db.cursor()
+    prepared.execute(curs, "SELECT COUNT(*) FROM contacts")
+    total = curs.fetchone()[0]
     curs.close()
-    return res 
+    return total
+
+def get_many(mm: ModelManager, filters: GetManyFilters) -> List[Contact]:
+    return get_page(mm, filters).contacts
 
+@dispatch
 def update(mm: ModelManager, contact: ContactForUpdate) -> None:
-    sql = "UPDATE contacts\n"
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact.id)
+
+    sets = []
     params = []
-    
     if contact.first_name is not None:
-        sql += "SET first_name = %s\n"
+        sets.append("first_name = %s")
         params.append(contact.first_name)
     if contact.last_name is not None:
-        sql += "SET last_name = %s\n"
+        sets.append("last_name = %s")
         params.append(contact.last_name)
+    params.append(contact.id)
 
-    for phone_num in contact.phones_c:
-        phone.create(mm, phone.PhoneForCreate(phone_num, contact.id))
+    # All phone changes go in one batch: the unique constraint on phone_e164
+    # replaces the per-number exist() probes. It is checked at the end of
+    # each statement, so numbers can be swapped within phones_u.
+    batch = []
+    batch_params = []
+    if contact.phones_d:
+        batch.append("DELETE FROM phones WHERE contact_id = %s AND id = ANY(%s)")
+        batch_params += [contact.id, contact.phones_d]
+    if contact.phones_u:
+        batch.append("""
+            UPDATE phones p
+            SET phone_num = u.num
+            FROM UNNEST(%s::int[], %s::text[]) AS u(id, num)
+            WHERE p.id = u.id AND p.contact_id = %s
+        """)
+        batch_params += [[p.id for p in contact.phones_u],
+                         [p.num for p in contact.phones_u], contact.id]
+    if contact.phones_c:
+        batch.append("""
+            INSERT INTO phones (phone_num, contact_id)
+            SELECT UNNEST(%s::text[]), %s
+        """)
+        batch_params += [contact.phones_c, contact.id]
 
-    for phone_id in contact.phones_d:
-        phone.delete(mm, phone_id)
-    
-    for phone_u in contact.phones_u:
-        phone.update(mm, phone_u)
-    
-    if len(params) > 0:
-        sql += "WHERE id = %s"
-        params.append(contact.id)
+    # Also rejects invalid numbers before anything is written.
+    keys = [phone.normalize(num) for num in contact.phones_c + [p.num for p in contact.phones_u]]
+    if mm.phone_filter is not None:
+        for key in keys:
+            mm.phone_filter.add(key)
+
+    try:
+        with mm.db.cursor() as curs:
+            if sets:
+                curs.execute(f"UPDATE contacts SET {', '.join(sets)} WHERE id = %s", params)
+            else:
+                curs.execute("SELECT id FROM contacts WHERE id = %s FOR UPDATE", params)
+            if curs.rowcount == 0:
+                raise EntityNotExist("contact", contact.id)
 
-        curs = mm.db.cursor()
-        curs.execute(sql, params)
-        curs.close()
+            if batch:
+                curs.execute(";\n".join(batch), batch_params)
+    except psycopg2.errors.UniqueViolation as error:
+        mm.db.rollback()
+        raise already_exist("phone", error)
+    except Exception:
+        mm.db.rollback()
+        raise
 
     mm.db.commit()
+    if mm.cache is not None:
+        # Again now that it is committed: a read in between may have cached
+        # the old row.
+        mm.cache.invalidate_contact(contact.id)
+    _reindex(mm, contact.id)
 
+@dispatch
 def delete(mm: ModelManager, id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(id)
+
     phone.delete_by_contact(mm, id)
 
     with mm.db.cursor() as curs:
@@ -163,4 +379,9 @@ def delete(mm: ModelManager, id: int) -> None:
             raise EntityNotExist("contact", id) 
 
     mm.db.commit()
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(id)
+
+    if mm.search_index is not None:
+        mm.search_index.remove(id)
 
@@ -0,0 +1,208 @@
+import random
+from array import array
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, List, Set, Tuple
+from . import ModelManager
+from . import contact
+from .backend import dispatch
+from .errors import ModelError
+from .search import name_text, trigrams
+
+# Contacts are compared only within blocks: the last SUFFIX_DIGITS digits of
+# a phone number, and MinHash LSH buckets of the name trigrams. With
+# BANDS bands of BAND_ROWS hashes, names with a trigram similarity of s
+# share a bucket with probability 1 - (1 - s ** BAND_ROWS) ** BANDS: 0.96
+# at 0.8, 0.32 at 0.5.
+SUFFIX_DIGITS = 7
+BANDS = 6
+BAND_ROWS = 4
+# Blocks this large are common names or numbers, not evidence of anything,
+# and would cost a quadratic number of comparisons.
+MAX_BLOCK = 64
+
+# A pair is a duplicate when its name similarity, plus PHONE_BONUS if the
+# two share a number suffix, reaches THRESHOLD. Names less similar than
+# NAME_FLOOR never match: a shared suffix alone does not make two people
+# one.
+THRESHOLD = 0.8
+NAME_FLOOR = 0.6
+PHONE_BONUS = 0.5
+
+APPLY_BATCH = 1000
+
+_rng = random.Random(0x5EED)
+_SALTS = [_rng.getrandbits(64) for _ in range(BANDS * BAND_ROWS)]
+_LOW = (1 << 32) - 1
+
+@dataclass
+class MergePlan:
+    # keep survives and takes over the phones of the others, each of which
+    # matched keep itself.
+    keep: int
+    merge: List[int]
+    # Score of each merged contact against keep, in merge order.
+    scores: List[float] = field(default_factory=list)
+    # Set once someone has reviewed the plan; apply() refuses it otherwise.
+    approved: bool = False
+
+@lru_cache(maxsize=1 << 16)
+def _grams(text: str) -> FrozenSet[str]:
+    return frozenset(trigrams(text))
+
+def _bands(grams: FrozenSet[str]) -> List[int]:
+    # MinHash with hash() xor a salt per row as the permutations; map()
+    # keeps the inner loop in C. hash() of a str is only stable within a
+    # process, which is all the buckets need.
+    hashes = [hash(gram) for gram in grams]
+    signature = tuple(min(map(salt.__xor__, hashes)) for salt in _SALTS)
+    return [hash(signature[i:i + BAND_ROWS]) for i in range(0, len(signature), BAND_ROWS)]
+
+def _runs(keys: array) -> Iterator[List[int]]:
+    # keys are (block << 32 | slot); yields the slots of each block with
+    # two to MAX_BLOCK members.
+    run: List[int] = []
+    block = None
+    for key in sorted(keys):
+        if key >> 32 != block:
+            if 1 < len(run) <= MAX_BLOCK:
+                yield run
+            run = []
+            block = key >> 32
+        run.append(key & _LOW)
+    if 1 < len(run) <= MAX_BLOCK:
+        yield run
+
+def _pairs(runs: Iterator[List[int]]) -> Iterator[int]:
+    for run in runs:
+        for i, a in enumerate(run):
+            for b in run[i + 1:]:
+                yield min(a, b) << 32 | max(a, b)
+
+def _clusters(matches: List[Tuple[float, int]]) -> Dict[int, List[Tuple[int, float]]]:
+    # matches are (score, pair). Clusters are stars, not transitive
+    # closures: a contact only joins one whose root it matched directly, so
+    # A~B and B~C do not merge A with C. Best matches are taken first; a
+    # new cluster's root is the smaller slot, i.e. the smaller id.
+    root_of: Dict[int, int] = {}
+    members: Dict[int, List[Tuple[int, float]]] = {}
+    for score, pair in sorted(matches, key=lambda match: (-match[0], match[1])):
+        a, b = pair >> 32, pair & _LOW
+        ra, rb = root_of.get(a), root_of.get(b)
+        if ra is None and rb is None:
+            root_of[a] = root_of[b] = a
+            members[a] = [(b, score)]
+        elif ra is None and rb == b:
+            root_of[a] = b
+            members[b].append((a, score))
+        elif rb is None and ra == a:
+            root_of[b] = a
+            members[a].append((b, score))
+    return members
+
+@dispatch
+def find(mm: ModelManager, threshold: float = THRESHOLD, itersize: int = 10_000) -> List[MergePlan]:
+    ids = array('q')
+    names: List[str] = []
+    suffixes = array('q')
+    bands = [array('q') for _ in range(BANDS)]
+
+    with mm.db.cursor(name="dedup_load") as curs:
+        curs.itersize = itersize
+        curs.execute("""
+            SELECT c.id, c.first_name, c.last_name,
+                COALESCE(ARRAY_AGG(p.phone_e164) FILTER (WHERE p.phone_e164 IS NOT NULL), '{}')
+            FROM contacts c
+            LEFT JOIN phones p ON p.contact_id = c.id
+            GROUP BY c.id
+            ORDER BY c.id
+        """)
+        for id, first_name, last_name, phones in curs:
+            slot = len(ids)
+            ids.append(id)
+            name = name_text(first_name, last_name).lower()
+            names.append(name)
+            for key in {num % 10 ** SUFFIX_DIGITS for num in phones}:
+                suffixes.append(key << 32 | slot)
+            grams = _grams(name)
+            if grams:
+                for band, key in zip(bands, _bands(grams)):
+                    band.append((key & 0x7FFFFFFF) << 32 | slot)
+    mm.db.commit()
+
+    shared_suffix: Set[int] = set(_pairs(_runs(suffixes)))
+    scored: Set[int] = set()
+    matches: List[Tuple[float, int]] = []
+
+    def score(pair: int) -> None:
+        if pair in scored:
+            return
+        scored.add(pair)
+        a, b = pair >> 32, pair & _LOW
+        ga, gb = _grams(names[a]), _grams(names[b])
+        common = len(ga & gb)
+        sim = common / (len(ga) + len(gb) - common) if ga and gb else 0.0
+        if sim < NAME_FLOOR:
+            return
+        if pair in shared_suffix:
+            sim += PHONE_BONUS
+        if sim >= threshold:
+            matches.append((sim, pair))
+
+    for pair in shared_suffix:
+        score(pair)
+    for band in bands:
+        for pair in _pairs(_runs(band)):
+            score(pair)
+
+    plans = []
+    for root, merged in sorted(_clusters(matches).items()):
+        merged.sort()
+        plans.append(MergePlan(ids[root], [ids[slot] for slot, _ in merged],
+                               [score for _, score in merged]))
+    return plans
+
+@dispatch
+def apply(mm: ModelManager, plans: List[MergePlan], batch_size: int = APPLY_BATCH) -> int:
+    # Each batch is one transaction: phones move to the kept contact, then
+    # the merged contacts go. Merging cannot be undone, so only plans that
+    # were reviewed and approved are taken.
+    unreviewed = sum(not plan.approved for plan in plans)
+    if unreviewed:
+        raise ModelError(f"{unreviewed} merge plans are not approved")
+
+    merged = 0
+    for start in range(0, len(plans), batch_size):
+        batch = plans[start:start + batch_size]
+        gone = [id for plan in batch for id in plan.merge]
+        keep = [plan.keep for plan in batch for _ in plan.merge]
+
+        if mm.cache is not None:
+            for id in keep + gone:
+                mm.cache.invalidate_contact(id)
+
+        try:
+            with mm.db.cursor() as curs:
+                curs.execute("""
+                    UPDATE phones p
+                    SET contact_id = m.keep
+                    FROM UNNEST(%s::int[], %s::int[]) AS m(id, keep)
+                    WHERE p.contact_id = m.id;
+                    DELETE FROM contacts WHERE id = ANY(%s)
+                """, (gone, keep, gone))
+        except Exception:
+            mm.db.rollback()
+            raise
+        mm.db.commit()
+
+        if mm.cache is not None:
+            # Again: a read before the commit may have cached the old rows.
+            for id in keep + gone:
+                mm.cache.invalidate_contact(id)
+        if mm.search_index is not None:
+            for id in gone:
+                mm.search_index.remove(id)
+            for plan in batch:
+                contact._reindex(mm, plan.keep)
+        merged += len(gone)
+    return merged
@@ -0,0 +1,23 @@
+import re
+import psycopg2.errors
+
+class ModelError(Exception):
+    pass
+
+class EntityNotExist(ModelError):
+    def __init__(self, entity: str, id: int) -> None:
+        super().__init__(f"{entity} with id {id} does not exist")
+
+class EntityAlreadyExist(ModelError):
+    def __init__(self, entity: str, value, other_id: int) -> None:
+        super().__init__(f"{entity} with value {value} already exists at id {other_id}")
+
+class InvalidPhoneNumber(ModelError):
+    def __init__(self, num: str) -> None:
+        super().__init__(f"phone number {num} is not valid")
+
+def already_exist(entity: str, error: psycopg2.errors.UniqueViolation) -> EntityAlreadyExist:
+    # Detail looks like: Key (phone_e164)=(77071772020) already exists.
+    match = re.search(r"\)=\((.*)\) already exists", error.diag.message_detail or "")
+    value = match.group(1) if match else None
+    return EntityAlreadyExist(entity, value, 0)
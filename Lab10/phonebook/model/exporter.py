@@ -0,0 +1,38 @@
+import csv
+from pathlib import Path
+from typing import IO
+from . import ModelManager
+from .backend import dispatch
+
+ITERSIZE = 2000
+
+@dispatch
+def write_rows(mm: ModelManager, file: IO[str], itersize: int = ITERSIZE) -> int:
+    # Same layout that importer.read_rows accepts.
+    writer = csv.writer(file, delimiter=';', lineterminator='\n')
+    writer.writerow(['first_name', 'last_name', 'phones'])
+
+    count = 0
+    # A named cursor lives on the server; rows arrive itersize at a time.
+    with mm.db.cursor(name="contacts_export") as curs:
+        curs.itersize = itersize
+        curs.execute("""
+            SELECT c.first_name, c.last_name, ph.phones
+            FROM contacts c
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(STRING_AGG(p.phone_num, ';' ORDER BY p.id), '') AS phones
+                FROM phones p
+                WHERE p.contact_id = c.id
+            ) ph
+            ORDER BY c.id
+        """)
+        for row in curs:
+            writer.writerow(row)
+            count += 1
+    mm.db.commit()
+
+    return count
+
+def export_csv(mm: ModelManager, path: Path, itersize: int = ITERSIZE) -> int:
+    with open(path, 'w', newline='') as file:
+        return write_rows(mm, file, itersize)
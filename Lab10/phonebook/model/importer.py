@@ -0,0 +1,253 @@
+import csv
+import io
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from . import ModelManager
+from . import phone
+from .backend import dispatch
+from .errors import InvalidPhoneNumber
+from .schema import NAME_LENGTH, PHONE_LENGTH
+
+CHUNK_SIZE = 10_000
+
+@dataclass
+class ImportRow:
+    row: int
+    first_name: str
+    last_name: str
+    phones: List[str]
+
+@dataclass
+class Reject:
+    row: int
+    reason: str
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejects: List[Reject] = field(default_factory=list)
+    # Rows read so far, loaded or not, and the seconds spent on them.
+    rows: int = 0
+    elapsed: float = 0.0
+    # For imports that track the file position: the byte offset this run
+    # started at, how far it got and the file size.
+    start: int = 0
+    offset: int = 0
+    size: int = 0
+    # For a resumed import, the line it picked up at and the rows rejected
+    # by the earlier runs; imported counts those runs as well.
+    resumed_line: Optional[int] = None
+    earlier_rejects: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def rejected(self) -> int:
+        return len(self.rejects) + self.earlier_rejects
+
+    @property
+    def eta(self) -> Optional[float]:
+        # Seconds left at the byte rate of this run so far.
+        done = self.offset - self.start
+        if done <= 0 or self.elapsed <= 0:
+            return None
+        return (self.size - self.offset) * self.elapsed / done
+
+# Valid rows ready for the database and the ones turned down.
+Batch = Tuple[List[ImportRow], List[Reject]]
+
+def to_row(num: int, row: Dict[str, Optional[str]]) -> ImportRow:
+    phones = (row.get('phones') or '').split(';')
+    phones = list(dict.fromkeys(p.strip() for p in phones if p.strip()))
+    return ImportRow(
+        num,
+        (row.get('first_name') or '').strip(),
+        (row.get('last_name') or '').strip(),
+        phones
+    )
+
+def read_rows(file: IO[str]) -> Iterator[ImportRow]:
+    reader = csv.DictReader(file, delimiter=';')
+    for num, row in enumerate(reader, start=1):
+        yield to_row(num, row)
+
+def validate(row: ImportRow) -> Optional[str]:
+    if len(row.first_name) == 0:
+        return "first name is empty"
+    # The staging tables take text of any length; the INSERT into the
+    # real columns would fail the whole chunk.
+    if len(row.first_name) > NAME_LENGTH:
+        return f"first name is longer than {NAME_LENGTH} characters"
+    if len(row.last_name) > NAME_LENGTH:
+        return f"last name is longer than {NAME_LENGTH} characters"
+    if len(row.phones) == 0:
+        return "no phone numbers"
+    for num in row.phones:
+        if len(num) > PHONE_LENGTH:
+            return f"phone number {num} is longer than {PHONE_LENGTH} characters"
+        try:
+            phone.normalize(num)
+        except InvalidPhoneNumber:
+            return f"phone number {num} is not valid"
+    return None
+
+def _chunks(rows: Iterable[ImportRow], size: int) -> Iterator[List[ImportRow]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@dispatch
+def _create_staging(mm: ModelManager) -> None:
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS contacts_import (
+                row_num bigint PRIMARY KEY,
+                first_name text NOT NULL,
+                last_name text NOT NULL,
+                contact_id int
+            );
+            CREATE TEMP TABLE IF NOT EXISTS phones_import (
+                row_num bigint NOT NULL,
+                phone_num text NOT NULL,
+                phone_e164 bigint NOT NULL
+            );
+            TRUNCATE contacts_import, phones_import;
+        """)
+
+def _copy(curs, table: str, columns: str, values: Iterable[tuple]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerows(values)
+    buf.seek(0)
+    curs.copy_expert(f"COPY {table}({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def _phones(chunk: List[ImportRow]) -> List[tuple]:
+    # One entry per number and row, even if the row spells it twice.
+    staged = []
+    for row in chunk:
+        keys = {}
+        for num in row.phones:
+            keys.setdefault(phone.normalize(num), num)
+        staged += [(row.row, num, key) for key, num in keys.items()]
+    return staged
+
+@dispatch
+def _load_chunk(mm: ModelManager, chunk: List[ImportRow], report: ImportReport) -> None:
+    # Leaves the transaction open: callers commit, possibly along with
+    # other writes such as a checkpoint.
+    phones = _phones(chunk)
+    if mm.phone_filter is not None:
+        # Rejected rows are added too; that only makes them false positives.
+        for _, _, key in phones:
+            mm.phone_filter.add(key)
+
+    with mm.db.cursor() as curs:
+        _copy(curs, "contacts_import", "row_num, first_name, last_name",
+              ((r.row, r.first_name, r.last_name) for r in chunk))
+        _copy(curs, "phones_import", "row_num, phone_num, phone_e164", phones)
+
+        curs.execute("""
+            DELETE FROM contacts_import ci
+            WHERE EXISTS (
+                SELECT 1
+                FROM phones_import pi
+                JOIN phones p ON p.phone_e164 = pi.phone_e164
+                WHERE pi.row_num = ci.row_num
+            )
+            RETURNING row_num
+        """)
+        rejected = [(row, "phone number already exists") for row, in curs.fetchall()]
+
+        # Within the chunk the first row that mentions a number wins.
+        curs.execute("""
+            DELETE FROM phones_import pi
+            WHERE NOT EXISTS (
+                SELECT 1 FROM contacts_import ci WHERE ci.row_num = pi.row_num
+            );
+            DELETE FROM contacts_import ci
+            WHERE EXISTS (
+                SELECT 1
+                FROM phones_import a
+                JOIN phones_import b
+                    ON b.phone_e164 = a.phone_e164 AND b.row_num < a.row_num
+                WHERE a.row_num = ci.row_num
+            )
+            RETURNING row_num
+        """)
+        rejected += [(row, "phone number repeats an earlier row") for row, in curs.fetchall()]
+
+        curs.execute("""
+            UPDATE contacts_import
+            SET contact_id = nextval(pg_get_serial_sequence('contacts', 'id'));
+
+            INSERT INTO contacts (id, first_name, last_name)
+            SELECT contact_id, first_name, last_name
+            FROM contacts_import;
+
+            INSERT INTO phones (phone_num, contact_id)
+            SELECT pi.phone_num, ci.contact_id
+            FROM phones_import pi
+            JOIN contacts_import ci USING (row_num);
+
+            SELECT COUNT(*) FROM contacts_import;
+        """)
+        imported = curs.fetchone()[0]
+
+        curs.execute("TRUNCATE contacts_import, phones_import")
+
+    report.imported += imported
+    report.rejects += [Reject(row, reason) for row, reason in sorted(rejected)]
+
+Progress = Callable[[ImportReport], None]
+
+def validated(rows: Iterable[ImportRow], chunk_size: int = CHUNK_SIZE) -> Iterator[Batch]:
+    for chunk in _chunks(rows, chunk_size):
+        valid = []
+        rejects = []
+        for row in chunk:
+            reason = validate(row)
+            if reason is None:
+                valid.append(row)
+            else:
+                rejects.append(Reject(row.row, reason))
+        yield valid, rejects
+
+@dispatch
+def load_batches(mm: ModelManager, batches: Iterable[Batch],
+                 chunk_size: int = CHUNK_SIZE,
+                 progress: Optional[Progress] = None) -> ImportReport:
+    report = ImportReport()
+    started = time.perf_counter()
+    _create_staging(mm)
+
+    for valid, rejects in batches:
+        report.rejects += rejects
+        for chunk in _chunks(valid, chunk_size):
+            _load_chunk(mm, chunk, report)
+            mm.db.commit()
+        report.rows += len(valid) + len(rejects)
+        report.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    report.rejects.sort(key=lambda reject: reject.row)
+    return report
+
+def load_rows(mm: ModelManager, rows: Iterable[ImportRow],
+              chunk_size: int = CHUNK_SIZE,
+              progress: Optional[Progress] = None) -> ImportReport:
+    return load_batches(mm, validated(rows, chunk_size), chunk_size, progress)
+
+def import_csv(mm: ModelManager, path: Path, chunk_size: int = CHUNK_SIZE,
+               progress: Optional[Progress] = None) -> ImportReport:
+    with open(path, newline='') as file:
+        return load_rows(mm, read_rows(file), chunk_size, progress)
@@ -0,0 +1,208 @@
+import csv
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from . import ModelManager
+from . import checkpoint
+from .checkpoint import Checkpoint
+from .errors import ModelError
+from .importer import (CHUNK_SIZE, Batch, ImportReport, Progress, Reject, _chunks, _create_staging,
+                       _load_chunk, load_batches, to_row, validate)
+
+CHUNK_BYTES = 1 << 20
+BLOCK_BYTES = 1 << 20
+ENCODING = 'utf-8'
+
+@dataclass
+class Span:
+    start: int
+    end: int
+    # Line of the first record in the span; the header is line 0, so rows
+    # get the same numbers as importer.read_rows gives them unless a quoted
+    # field spans several lines.
+    line: int
+    # Line of the record right after the span.
+    end_line: int
+
+def _header(path: Path) -> Tuple[List[str], int]:
+    with open(path, 'rb') as file:
+        first = file.readline()
+    fields = next(csv.reader([first.decode(ENCODING)], delimiter=';'), [])
+    return fields, len(first)
+
+def split(path: Path, start: int, chunk_bytes: int = CHUNK_BYTES, line: int = 1) -> Iterator[Span]:
+    # Cuts right after newlines that are outside quotes. An escaped "" flips
+    # the quote state twice, so the parity of the quote count is enough to
+    # know whether a newline ends a record. start must be the beginning of
+    # a record, the given line.
+    quoted = 0
+    span_start, span_line = start, line
+    with open(path, 'rb') as file:
+        file.seek(start)
+        offset = start
+        while True:
+            block = file.read(BLOCK_BYTES)
+            if not block:
+                break
+
+            # quoted and line describe everything before block[i].
+            i = 0
+            while span_start + chunk_bytes - offset < len(block):
+                j = max(span_start + chunk_bytes - offset, i)
+                quoted ^= block.count(b'"', i, j) & 1
+                line += block.count(b'\n', i, j)
+                i = j
+
+                cut = None
+                while cut is None:
+                    nl = block.find(b'\n', i)
+                    if nl < 0:
+                        break
+                    quoted ^= block.count(b'"', i, nl) & 1
+                    line += 1
+                    i = nl + 1
+                    if not quoted:
+                        cut = i
+                if cut is None:
+                    break
+
+                yield Span(span_start, offset + cut, span_line, line)
+                span_start, span_line = offset + cut, line
+
+            quoted ^= block.count(b'"', i) & 1
+            line += block.count(b'\n', i)
+            offset += len(block)
+
+    if offset > span_start:
+        yield Span(span_start, offset, span_line, line)
+
+def parse_span(path: Path, span: Span, fields: List[str]) -> Batch:
+    with open(path, 'rb') as file:
+        file.seek(span.start)
+        text = file.read(span.end - span.start).decode(ENCODING)
+
+    valid = []
+    rejects = []
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=';')
+    before = 0
+    for values in reader:
+        num = span.line + before
+        before = reader.line_num
+        if not values:
+            continue
+        row = to_row(num, dict(zip(fields, values)))
+        reason = validate(row)
+        if reason is None:
+            valid.append(row)
+        else:
+            rejects.append(Reject(row.row, reason))
+    return valid, rejects
+
+def parse_spans(path: Path, spans: Iterable[Span], fields: List[str],
+                workers: Optional[int] = None,
+                ordered: bool = True) -> Iterator[Tuple[Span, Batch]]:
+    # Spans are parsed and validated in worker processes while the caller
+    # loads earlier batches. Unordered batches come as soon as they are
+    # ready, so the first of two rows sharing a number is not guaranteed
+    # to be the one kept.
+    workers = workers or os.cpu_count() or 1
+    # spawn, not fork: a forked child would share the caller's database
+    # sockets and close them on exit.
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    # In submission order.
+    pending: Dict[Future, Span] = {}
+
+    def ready() -> Iterator[Tuple[Span, Batch]]:
+        if ordered:
+            future = next(iter(pending))
+            yield pending.pop(future), future.result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
+
+    try:
+        for span in spans:
+            pending[pool.submit(parse_span, path, span, fields)] = span
+            # Bounds memory when the loader is slower than the parsers.
+            if len(pending) >= 2 * workers:
+                yield from ready()
+        while pending:
+            yield from ready()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def parse(path: Path, workers: Optional[int] = None, ordered: bool = True,
+          chunk_bytes: int = CHUNK_BYTES) -> Iterator[Batch]:
+    fields, start = _header(path)
+    for _, batch in parse_spans(path, split(path, start, chunk_bytes), fields, workers, ordered):
+        yield batch
+
+def import_csv(mm: ModelManager, path: Path, workers: Optional[int] = None,
+               ordered: bool = True, chunk_size: int = CHUNK_SIZE,
+               progress: Optional[Progress] = None) -> ImportReport:
+    return load_batches(mm, parse(path, workers, ordered), chunk_size, progress)
+
+def import_resumable(mm: ModelManager, path: Path, workers: Optional[int] = None,
+                     chunk_size: int = CHUNK_SIZE, chunk_bytes: int = CHUNK_BYTES,
+                     progress: Optional[Progress] = None,
+                     stop: Optional[threading.Event] = None) -> ImportReport:
+    # Loads span by span in file order, committing each along with a
+    # checkpoint of where the next one starts. Run again on the same file
+    # after a crash or a stop, it carries on from the last checkpoint;
+    # only the rejects of the current run are listed. The checkpoint is
+    # removed once the whole file is in. Setting stop, from any thread,
+    # ends the import before the next span.
+    try:
+        return _import_resumable(mm, path, workers, chunk_size, chunk_bytes, progress, stop)
+    except (OSError, UnicodeDecodeError, csv.Error) as error:
+        raise ModelError(f"cannot read {path}: {error}") from error
+
+def _import_resumable(mm: ModelManager, path: Path, workers: Optional[int], chunk_size: int,
+                      chunk_bytes: int, progress: Optional[Progress],
+                      stop: Optional[threading.Event]) -> ImportReport:
+    file_hash = checkpoint.file_hash(path)
+    fields, start = _header(path)
+    cp = checkpoint.load(mm, file_hash)
+    report = ImportReport(size=path.stat().st_size)
+    if cp is None:
+        cp = Checkpoint(file_hash, start, 1, 0, 0)
+    else:
+        report.imported = cp.imported
+        report.resumed_line = cp.line
+        report.earlier_rejects = cp.rejected
+    report.start = report.offset = cp.offset
+    if progress is not None:
+        progress(report)
+
+    started = time.perf_counter()
+    _create_staging(mm)
+    spans = split(path, cp.offset, chunk_bytes, cp.line)
+    for span, (valid, rejects) in parse_spans(path, spans, fields, workers):
+        if stop is not None and stop.is_set():
+            # The checkpoint stays for the next run.
+            break
+        report.rejects += rejects
+        for chunk in _chunks(valid, chunk_size):
+            _load_chunk(mm, chunk, report)
+        cp.offset, cp.line = span.end, span.end_line
+        cp.imported, cp.rejected = report.imported, report.rejected
+        checkpoint.save(mm, cp)
+        mm.db.commit()
+
+        report.rows += len(valid) + len(rejects)
+        report.offset = span.end
+        report.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+    else:
+        checkpoint.clear(mm, file_hash)
+
+    report.rejects.sort(key=lambda reject: reject.row)
+    return report
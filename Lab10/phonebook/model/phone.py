@@ -1,6 +1,16 @@
+import re
 from dataclasses import dataclass
-from typing import List
+from typing import List, Tuple
 from . import ModelManager
+from . import prepared
+from .backend import dispatch
+from .errors import EntityAlreadyExist, InvalidPhoneNumber, already_exist
+from .schema import COUNTRY_CODE, NATIONAL_DIGITS, PHONES_DENORMALIZED, TRUNK_PREFIX
+import psycopg2.errors
+
+# ASCII digits only, as in SQL: \d would also take other scripts' digits.
+_NOT_DIGIT = re.compile(r"[^0-9]")
+_E164 = re.compile(r"[1-9][0-9]{0,14}")
 
 @dataclass
 class Phone:
@@ -12,18 +22,55 @@ class PhoneForCreate:
     num: str 
     contact_id: int
 
+def normalize(num: str) -> int:
+    # Same rules as the phone_e164() SQL function in schema.py.
+    digits = _NOT_DIGIT.sub("", num)
+    if num.lstrip().startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif len(digits) == NATIONAL_DIGITS + 1 and digits.startswith(TRUNK_PREFIX):
+        digits = COUNTRY_CODE + digits[1:]
+    elif len(digits) == NATIONAL_DIGITS:
+        digits = COUNTRY_CODE + digits
+
+    if not _E164.fullmatch(digits):
+        raise InvalidPhoneNumber(num)
+    return int(digits)
+
+def suffix_range(suffix: str) -> Tuple[str, str]:
+    # Bounds on reversed digits for numbers ending in suffix; digits sort
+    # right below ':', so bumping the last one gives the upper bound.
+    digits = _NOT_DIGIT.sub("", suffix)[::-1]
+    if not digits:
+        raise InvalidPhoneNumber(suffix)
+    return digits, digits[:-1] + chr(ord(digits[-1]) + 1)
+
+@dispatch
 def create(mm: ModelManager, phone: PhoneForCreate) -> int:
     if exist(mm, phone.num):
-        raise Exception(f"Contact with phone number {phone.num} already exists.")
+        raise EntityAlreadyExist("phone", phone.num, 0)
+
+    # The phone functions leave committing to the caller, so they can only
+    # invalidate before writing; callers invalidate again after commit(),
+    # as the contact functions do.
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(phone.contact_id)
+
+    if mm.phone_filter is not None:
+        mm.phone_filter.add(normalize(phone.num))
 
     curs = mm.db.cursor()
-    curs.execute("""
-        INSERT INTO phones (
-            phone_num, contact_id
-        ) 
-        VALUES (%s, %s) 
-        RETURNING id
-    """, (phone.num, phone.contact_id))
+    try:
+        prepared.execute(curs, """
+            INSERT INTO phones (
+                phone_num, contact_id
+            ) 
+            VALUES (%s, %s) 
+            RETURNING id
+        """, (phone.num, phone.contact_id))
+    except psycopg2.errors.UniqueViolation as error:
+        raise already_exist("phone", error)
     
     row = curs.fetchone()
     id = row[0]
@@ -31,37 +78,74 @@ def create(mm: ModelManager, phone: PhoneForCreate) -> int:
     curs.close()
     return id
 
+@dispatch
 def get_by_contact(mm: ModelManager, contact_id: int) -> List[Phone]:
+    if mm.cache is not None:
+        cached = mm.cache.get_phones(contact_id)
+        if cached is not None:
+            return cached
+
     curs = mm.db.cursor()
-    curs.execute("""
-        SELECT id, phone_num
-        FROM phones
-        WHERE contact_id = %s
-    """, (contact_id,))
-    rows = curs.fetchall()
+    if mm.denormalized:
+        # One row: the arrays of the contact, if it exists.
+        prepared.execute(curs, f"""
+            SELECT {PHONES_DENORMALIZED}
+            FROM contacts c
+            WHERE c.id = %s
+        """, (contact_id,))
+        rows = list(zip(*curs.fetchone() or ([], [])))
+    else:
+        prepared.execute(curs, """
+            SELECT id, phone_num
+            FROM phones
+            WHERE contact_id = %s
+        """, (contact_id,))
+        rows = curs.fetchall()
     curs.close()
-    return list(map(lambda row: Phone(*row), rows))
+    phones = list(map(lambda row: Phone(*row), rows))
+
+    if mm.cache is not None:
+        mm.cache.put_phones(contact_id, phones)
+    return phones
 
+@dispatch
 def exist(mm: ModelManager, num: str) -> bool:
+    key = normalize(num)
+    if mm.phone_filter is not None and not mm.phone_filter.might_contain(key):
+        return False
+
     curs = mm.db.cursor()
-    curs.execute("SELECT id FROM phones WHERE phone_num = %s", (num,))
+    prepared.execute(curs, "SELECT id FROM phones WHERE phone_e164 = %s", (key,))
     count = curs.rowcount
     curs.close()
     return count > 0 
 
+@dispatch
 def update(mm: ModelManager, phone: Phone) -> None:
     if exist(mm, phone.num):
-        raise Exception(f"Contact with phone number {phone.num} already exists.")
+        raise EntityAlreadyExist("phone", phone.num, 0)
+
+    if mm.cache is not None:
+        mm.cache.invalidate_phone(phone.id)
+    if mm.phone_filter is not None:
+        mm.phone_filter.add(normalize(phone.num))
     
     curs = mm.db.cursor()
-    curs.execute(""" 
-        UPDATE phones
-        SET phone_num = %s 
-        WHERE id = %s 
-    """, (phone.num, phone.id))
+    try:
+        curs.execute(""" 
+            UPDATE phones
+            SET phone_num = %s 
+            WHERE id = %s 
+        """, (phone.num, phone.id))
+    except psycopg2.errors.UniqueViolation as error:
+        raise already_exist("phone", error)
     curs.close()
 
+@dispatch
 def delete(mm: ModelManager, id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_phone(id)
+
     curs = mm.db.cursor()
     curs.execute("""
         DELETE FROM phones
@@ -69,7 +153,11 @@ def delete(mm: ModelManager, id: int) -> None:
     """, (id,))
     curs.close()
 
+@dispatch
 def delete_by_contact(mm: ModelManager, contact_id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact_id)
+
     curs = mm.db.cursor()
     curs.execute("""
         DELETE FROM phones
@@ -0,0 +1,46 @@
+import hashlib
+import math
+from typing import Iterable, Iterator
+from . import ModelManager
+from .backend import dispatch
+
+class PhoneFilter:
+    # Bloom filter of the phone numbers in the database, keyed by their
+    # E.164 form from phone.normalize(). might_contain() never answers False
+    # for a number that was added; deleted numbers stay in as false
+    # positives, which only cost the usual round trip.
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int) -> Iterable[int]:
+        digest = hashlib.blake2b(key.to_bytes(8, 'little'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: int) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def might_contain(self, key: int) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def load(self, mm: ModelManager, itersize: int = 10_000) -> None:
+        for key in _keys(mm, itersize):
+            self.add(key)
+
+@dispatch
+def _keys(mm: ModelManager, itersize: int) -> Iterator[int]:
+    # Every phone_e164 in the database, for PhoneFilter.load.
+    with mm.db.cursor(name="phone_filter_load") as curs:
+        curs.itersize = itersize
+        curs.execute("SELECT phone_e164 FROM phones WHERE phone_e164 IS NOT NULL")
+        for key, in curs:
+            yield key
+    mm.db.commit()
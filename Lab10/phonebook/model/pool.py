@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List, Tuple
+import psycopg2
+import psycopg2.extensions
+from .errors import ModelError
+
+@dataclass
+class PoolStats:
+    created: int = 0
+    discarded: int = 0
+    checkouts: int = 0
+    in_use: int = 0
+    idle: int = 0
+    waiting: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+class PoolError(ModelError):
+    # A ModelError, so that views report a pool timeout like any failed call.
+    pass
+
+class PoolTimeout(PoolError):
+    def __init__(self, timeout: float) -> None:
+        super().__init__(f"no connection available after {timeout} seconds")
+
+class ConnectionPool:
+    def __init__(self, params: Dict, maxconn: int = 4, timeout: float = 30.0,
+                 check_after: float = 5.0) -> None:
+        if maxconn < 1:
+            raise ValueError("maxconn must be at least 1")
+        self.params = params
+        self.maxconn = maxconn
+        self.timeout = timeout
+        # Connections idle for longer than this are pinged before reuse.
+        self.check_after = check_after
+        self._idle: List[Tuple[psycopg2.extensions.connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats()
+        self._cond = threading.Condition()
+
+    def _reserve(self, deadline: float):
+        with self._cond:
+            self._stats.waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolError("pool is closed")
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(self.timeout)
+                    self._cond.wait(remaining)
+            finally:
+                self._stats.waiting -= 1
+
+    def _healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if time.monotonic() - idle_since > self.check_after:
+                with conn.cursor() as curs:
+                    curs.execute("SELECT 1")
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats.discarded += 1
+            self._cond.notify()
+
+    def getconn(self) -> psycopg2.extensions.connection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            reserved = self._reserve(deadline)
+            if reserved is None:
+                try:
+                    conn = psycopg2.connect(**self.params)
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats.created += 1
+                break
+
+            conn, idle_since = reserved
+            if self._healthy(conn, idle_since):
+                break
+            self._discard(conn)
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats.checkouts += 1
+            self._stats.in_use += 1
+            self._stats.wait_seconds += waited
+            self._stats.max_wait_seconds = max(self._stats.max_wait_seconds, waited)
+        return conn
+
+    def putconn(self, conn: psycopg2.extensions.connection) -> None:
+        with self._cond:
+            self._stats.in_use -= 1
+
+        if self._closed or conn.closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return replace(self._stats, idle=len(self._idle))
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
@@ -0,0 +1,69 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+import psycopg2.extensions
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+Params = Union[Sequence, dict, None]
+
+# Statement name -> the SQL it was prepared from, for query statistics.
+SOURCES: Dict[str, str] = {}
+
+class Connection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Names of the statements PREPAREd in this session.
+        self.prepared: Optional[Set[str]] = set()
+
+@lru_cache(maxsize=256)
+def _native(sql: str) -> Tuple[str, str, Tuple]:
+    # Rewrites psycopg2 placeholders into $n parameters. Named placeholders
+    # that repeat share one parameter. Literal %% stays escaped because the
+    # statement still goes through psycopg2 formatting.
+    keys: List = []
+
+    def replace(match: re.Match) -> str:
+        if match.group(0) == "%%":
+            return "%%"
+        key = match.group(1) if match.group(1) is not None else len(keys)
+        if match.group(1) is None or key not in keys:
+            keys.append(key)
+        return f"${keys.index(key) + 1}"
+
+    native = _PLACEHOLDER.sub(replace, sql)
+    name = "pb_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    SOURCES[name] = sql
+    return name, native, tuple(keys)
+
+def execute(curs, sql: str, params: Params = None,
+            before: Optional[Tuple[str, Sequence]] = None) -> None:
+    # Runs sql as a server-side prepared statement of the cursor's
+    # connection, PREPAREing it on first use. 'before' is a plain statement
+    # sent in the same round trip ahead of the EXECUTE.
+    prepared = getattr(curs.connection, 'prepared', None)
+    if prepared is None:
+        if before is not None:
+            curs.execute(*before)
+        curs.execute(sql, params)
+        return
+
+    name, native, keys = _native(sql)
+    if name not in prepared:
+        curs.execute(f"PREPARE {name} AS {native}", [])
+        prepared.add(name)
+
+    if isinstance(params, dict):
+        args = [params[key] for key in keys]
+    else:
+        args = list(params or ())
+    stmt = f"EXECUTE {name}"
+    if args:
+        stmt += "(" + ", ".join(["%s"] * len(args)) + ")"
+
+    if before is not None:
+        before_sql, before_args = before
+        stmt = f"{before_sql};\n{stmt}"
+        args = [*before_args, *args]
+    curs.execute(stmt, args)
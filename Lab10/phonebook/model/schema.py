@@ -0,0 +1,358 @@
+from . import ModelManager
+from .backend import dispatch
+
+# Normalized full name; queries must use the exact same expression for the
+# planner to match it against contacts_name_trgm_idx.
+NAME_EXPR = "LOWER(first_name || ' ' || COALESCE(last_name, ''))"
+
+# Phone numbers are also kept as E.164 digits in phones.phone_e164. Numbers
+# without a leading + or 00 are national: an 8 trunk prefix or no prefix at
+# all stands for COUNTRY_CODE. phone.normalize() mirrors phone_e164().
+COUNTRY_CODE = "7"
+TRUNK_PREFIX = "8"
+NATIONAL_DIGITS = 10
+
+# Reversed digits, so that a suffix search is a prefix range over
+# phones_e164_rev_idx.
+SUFFIX_EXPR = "reverse(phone_e164::text)"
+
+BACKFILL_BATCH = 10_000
+
+# Committed changes to contacts and phones are announced on this channel,
+# one NOTIFY per row: "<table> <id> <I|U|D> <contact id>". A statement
+# touching more than NOTIFY_MAX_ROWS rows sends a single "<table> * <op>"
+# instead. model.changes listens to it.
+CHANGES_CHANNEL = "phonebook_changes"
+NOTIFY_MAX_ROWS = 100
+
+# Column sizes of the tables below.
+NAME_LENGTH = 255
+PHONE_LENGTH = 32
+
+# Tables and the create_or_replace_contact procedure the model expects. Only
+# applied by create(), for fresh databases such as the benchmark ones.
+BASE = [
+    f"""
+        CREATE TABLE IF NOT EXISTS contacts (
+            id SERIAL PRIMARY KEY,
+            first_name VARCHAR({NAME_LENGTH}) NOT NULL,
+            last_name VARCHAR({NAME_LENGTH}) NOT NULL DEFAULT ''
+        )
+    """,
+    f"""
+        CREATE TABLE IF NOT EXISTS phones (
+            id SERIAL PRIMARY KEY,
+            phone_num VARCHAR({PHONE_LENGTH}) NOT NULL,
+            contact_id INT NOT NULL REFERENCES contacts (id)
+        )
+    """,
+    f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'contact_for_create') THEN
+                CREATE TYPE contact_for_create AS (
+                    first_name VARCHAR({NAME_LENGTH}),
+                    last_name VARCHAR({NAME_LENGTH}),
+                    phone_num VARCHAR({PHONE_LENGTH})
+                );
+            END IF;
+        END
+        $$
+    """,
+    # Inserts a contact with one phone, or replaces the phones of the
+    # contact that already has this name.
+    """
+        CREATE OR REPLACE PROCEDURE create_or_replace_contact(
+            contact contact_for_create,
+            INOUT new_id INT
+        )
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            SELECT id INTO new_id
+            FROM contacts
+            WHERE first_name = contact.first_name AND last_name = contact.last_name
+            ORDER BY id
+            LIMIT 1;
+
+            IF new_id IS NULL THEN
+                INSERT INTO contacts (first_name, last_name)
+                VALUES (contact.first_name, contact.last_name)
+                RETURNING id INTO new_id;
+            ELSE
+                DELETE FROM phones WHERE contact_id = new_id;
+            END IF;
+
+            INSERT INTO phones (phone_num, contact_id)
+            VALUES (contact.phone_num, new_id);
+        END
+        $$
+    """,
+]
+
+def _backfill_e164(mm: ModelManager, batch: int = BACKFILL_BATCH) -> None:
+    # Rows written before the trigger existed. One short transaction per
+    # batch keeps the table usable while this runs.
+    last = 0
+    while last is not None:
+        with mm.db.cursor() as curs:
+            curs.execute("""
+                WITH batch AS (
+                    SELECT id FROM phones WHERE id > %s ORDER BY id LIMIT %s
+                ), filled AS (
+                    UPDATE phones p
+                    SET phone_e164 = phone_e164(p.phone_num)
+                    FROM batch
+                    WHERE p.id = batch.id AND p.phone_e164 IS NULL
+                )
+                SELECT MAX(id) FROM batch
+            """, (last, batch))
+            last = curs.fetchone()[0]
+        mm.db.commit()
+
+MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS phones_contact_id_idx ON phones (contact_id)",
+    # Deferrable so that it is checked per statement, not per row.
+    """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'phones_phone_num_key') THEN
+                ALTER TABLE phones ADD CONSTRAINT phones_phone_num_key
+                    UNIQUE (phone_num) DEFERRABLE INITIALLY IMMEDIATE;
+            END IF;
+        END
+        $$
+    """,
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+        CREATE INDEX IF NOT EXISTS contacts_name_trgm_idx
+        ON contacts USING GIST (({NAME_EXPR}) gist_trgm_ops)
+    """,
+    "ALTER TABLE phones ADD COLUMN IF NOT EXISTS phone_e164 BIGINT",
+    # NULL for numbers that are not valid E.164 once normalized.
+    rf"""
+        CREATE OR REPLACE FUNCTION phone_e164(num TEXT) RETURNS BIGINT
+        LANGUAGE sql IMMUTABLE STRICT AS $$
+            SELECT CASE WHEN e164 ~ '^[1-9][0-9]{{0,14}}$' THEN e164::BIGINT END
+            FROM (
+                SELECT CASE
+                    WHEN num ~ '^\s*\+' THEN digits
+                    WHEN digits LIKE '00%' THEN substr(digits, 3)
+                    WHEN length(digits) = {NATIONAL_DIGITS + 1} AND digits LIKE '{TRUNK_PREFIX}%'
+                        THEN '{COUNTRY_CODE}' || substr(digits, 2)
+                    WHEN length(digits) = {NATIONAL_DIGITS} THEN '{COUNTRY_CODE}' || digits
+                    ELSE digits
+                END AS e164
+                FROM (SELECT regexp_replace(num, '[^0-9]', '', 'g') AS digits) d
+            ) n
+        $$
+    """,
+    """
+        CREATE OR REPLACE FUNCTION phones_set_e164() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.phone_e164 := phone_e164(NEW.phone_num);
+            RETURN NEW;
+        END
+        $$
+    """,
+    """
+        CREATE OR REPLACE TRIGGER phones_set_e164
+        BEFORE INSERT OR UPDATE OF phone_num ON phones
+        FOR EACH ROW EXECUTE FUNCTION phones_set_e164()
+    """,
+    _backfill_e164,
+    # Fails if existing numbers collide once normalized; those have to be
+    # merged by hand before rerunning migrate().
+    """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'phones_phone_e164_key') THEN
+                ALTER TABLE phones ADD CONSTRAINT phones_phone_e164_key
+                    UNIQUE (phone_e164) DEFERRABLE INITIALLY IMMEDIATE;
+            END IF;
+        END
+        $$
+    """,
+    f"""
+        CREATE INDEX IF NOT EXISTS phones_e164_rev_idx
+        ON phones (({SUFFIX_EXPR}) text_pattern_ops)
+    """,
+    # Statement-level, so that the row count is known before anything is
+    # sent. Updates report old and new rows: a phone may change contacts.
+    f"""
+        CREATE OR REPLACE FUNCTION notify_changes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            changed JSONB[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                changed := ARRAY(SELECT to_jsonb(r) FROM new_rows r);
+            ELSIF TG_OP = 'UPDATE' THEN
+                changed := ARRAY(SELECT to_jsonb(r) FROM new_rows r
+                                 UNION SELECT to_jsonb(r) FROM old_rows r);
+            ELSE
+                changed := ARRAY(SELECT to_jsonb(r) FROM old_rows r);
+            END IF;
+
+            IF cardinality(changed) > {NOTIFY_MAX_ROWS} THEN
+                PERFORM pg_notify('{CHANGES_CHANNEL}', concat_ws(' ', TG_TABLE_NAME, '*', left(TG_OP, 1)));
+            ELSE
+                PERFORM pg_notify('{CHANGES_CHANNEL}', concat_ws(' ',
+                    TG_TABLE_NAME, r->>'id', left(TG_OP, 1), COALESCE(r->>'contact_id', r->>'id')))
+                FROM unnest(changed) AS r;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """,
+    *(
+        f"""
+            CREATE OR REPLACE TRIGGER {table}_notify_{op.lower()}
+            AFTER {op} ON {table}
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_changes()
+        """
+        for table in ("contacts", "phones")
+        for op, transition in (
+            ("INSERT", "NEW TABLE AS new_rows"),
+            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("DELETE", "OLD TABLE AS old_rows"),
+        )
+    ),
+    # Where a resumable import of a file got to; see model.checkpoint.
+    """
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            file_hash TEXT PRIMARY KEY,
+            byte_offset BIGINT NOT NULL,
+            line INT NOT NULL,
+            imported BIGINT NOT NULL,
+            rejected BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """,
+]
+
+# Optional denormalized mode, applied by denormalize(): each contact also
+# carries its phones in phone_ids and phone_nums, in PHONES_LATERAL order,
+# so that reading a contact is a single row lookup. Statement-level triggers
+# on phones keep them in sync, one UPDATE per statement whatever the number
+# of rows, at the cost of rewriting the contact row on every phone change.
+PHONE_ARRAYS = """
+    phone_ids = ARRAY(SELECT id FROM phones WHERE contact_id = c.id ORDER BY id),
+    phone_nums = ARRAY(SELECT phone_num FROM phones WHERE contact_id = c.id ORDER BY id)
+"""
+
+# Select list for the arrays of contact c. Rows the backfill has not reached
+# yet are NULL and read the phones table instead.
+PHONES_DENORMALIZED = """
+    COALESCE(c.phone_ids, ARRAY(SELECT id FROM phones WHERE contact_id = c.id ORDER BY id)) AS phone_ids,
+    COALESCE(c.phone_nums, ARRAY(SELECT phone_num FROM phones WHERE contact_id = c.id ORDER BY id)) AS phone_nums
+"""
+
+def _backfill_phones(mm: ModelManager, batch: int = BACKFILL_BATCH) -> None:
+    # Contacts the triggers have not touched yet. The triggers exist by now,
+    # so a row that is no longer NULL is already up to date and skipped.
+    last = 0
+    while last is not None:
+        with mm.db.cursor() as curs:
+            curs.execute(f"""
+                WITH batch AS (
+                    SELECT id FROM contacts WHERE id > %s ORDER BY id LIMIT %s
+                ), filled AS (
+                    UPDATE contacts c
+                    SET {PHONE_ARRAYS}
+                    FROM batch
+                    WHERE c.id = batch.id AND c.phone_ids IS NULL
+                )
+                SELECT MAX(id) FROM batch
+            """, (last, batch))
+            last = curs.fetchone()[0]
+        mm.db.commit()
+
+DENORMALIZE = [
+    f"""
+        ALTER TABLE contacts
+            ADD COLUMN IF NOT EXISTS phone_ids INT[],
+            ADD COLUMN IF NOT EXISTS phone_nums VARCHAR({PHONE_LENGTH})[]
+    """,
+    # Transition tables only exist for the events that declare them; PL/pgSQL
+    # plans a statement when it first runs, so the other branches are safe.
+    # The contacts are locked before the UPDATE, which then runs with a
+    # snapshot of its own: if it waited on the row lock instead, it would
+    # recheck the row but compute the arrays from the older snapshot, and
+    # drop the phones another transaction had just committed.
+    f"""
+        CREATE OR REPLACE FUNCTION contacts_sync_phones() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            ids INT[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                ids := ARRAY(SELECT DISTINCT contact_id FROM new_phones);
+            ELSIF TG_OP = 'UPDATE' THEN
+                ids := ARRAY(SELECT contact_id FROM new_phones
+                             UNION SELECT contact_id FROM old_phones);
+            ELSE
+                ids := ARRAY(SELECT DISTINCT contact_id FROM old_phones);
+            END IF;
+
+            PERFORM 1 FROM contacts WHERE id = ANY(ids) ORDER BY id FOR UPDATE;
+            UPDATE contacts c
+            SET {PHONE_ARRAYS}
+            WHERE c.id = ANY(ids);
+            RETURN NULL;
+        END
+        $$
+    """,
+    """
+        CREATE OR REPLACE TRIGGER phones_sync_insert
+        AFTER INSERT ON phones
+        REFERENCING NEW TABLE AS new_phones
+        FOR EACH STATEMENT EXECUTE FUNCTION contacts_sync_phones()
+    """,
+    """
+        CREATE OR REPLACE TRIGGER phones_sync_update
+        AFTER UPDATE ON phones
+        REFERENCING OLD TABLE AS old_phones NEW TABLE AS new_phones
+        FOR EACH STATEMENT EXECUTE FUNCTION contacts_sync_phones()
+    """,
+    """
+        CREATE OR REPLACE TRIGGER phones_sync_delete
+        AFTER DELETE ON phones
+        REFERENCING OLD TABLE AS old_phones
+        FOR EACH STATEMENT EXECUTE FUNCTION contacts_sync_phones()
+    """,
+    # Only now: a contact created before the triggers and given the default
+    # would look filled in to the backfill.
+    """
+        ALTER TABLE contacts
+            ALTER COLUMN phone_ids SET DEFAULT '{}',
+            ALTER COLUMN phone_nums SET DEFAULT '{}'
+    """,
+    _backfill_phones,
+]
+
+def _apply(mm: ModelManager, statements) -> None:
+    # One commit per step, so a failing step keeps the ones before it.
+    for step in statements:
+        if callable(step):
+            step(mm)
+            continue
+        with mm.db.cursor() as curs:
+            curs.execute(step)
+        mm.db.commit()
+
+@dispatch
+def migrate(mm: ModelManager) -> None:
+    _apply(mm, MIGRATIONS)
+
+@dispatch
+def create(mm: ModelManager) -> None:
+    _apply(mm, BASE)
+    migrate(mm)
+
+@dispatch
+def denormalize(mm: ModelManager) -> None:
+    # Safe to run on a live database and to rerun. Reads use the arrays once
+    # mm.denormalized is set.
+    _apply(mm, DENORMALIZE)
@@ -0,0 +1,17 @@
+import sqlite3
+
+# Seconds to wait for another connection's write lock before failing with
+# "database is locked".
+BUSY_TIMEOUT = 5.0
+
+def connect(path: str) -> sqlite3.Connection:
+    # WAL lets readers go on while one connection writes. With WAL, NORMAL
+    # sync only risks the last transactions on power loss, never corruption.
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA foreign_keys = ON")
+    return db
+
+def is_unique_violation(error: sqlite3.IntegrityError) -> bool:
+    return getattr(error, 'sqlite_errorname', None) == "SQLITE_CONSTRAINT_UNIQUE"
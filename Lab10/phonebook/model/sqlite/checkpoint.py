@@ -0,0 +1,25 @@
+from typing import Optional
+from .. import ModelManager
+from ..checkpoint import Checkpoint
+
+def load(mm: ModelManager, file_hash: str) -> Optional[Checkpoint]:
+    row = mm.db.execute("""
+        SELECT file_hash, byte_offset, line, imported, rejected
+        FROM import_checkpoints
+        WHERE file_hash = ?
+    """, (file_hash,)).fetchone()
+    return Checkpoint(*row) if row is not None else None
+
+def save(mm: ModelManager, cp: Checkpoint) -> None:
+    mm.db.execute("""
+        INSERT INTO import_checkpoints (file_hash, byte_offset, line, imported, rejected)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (file_hash) DO UPDATE
+        SET byte_offset = excluded.byte_offset, line = excluded.line,
+            imported = excluded.imported, rejected = excluded.rejected,
+            updated_at = CURRENT_TIMESTAMP
+    """, (cp.file_hash, cp.offset, cp.line, cp.imported, cp.rejected))
+
+def clear(mm: ModelManager, file_hash: str) -> None:
+    mm.db.execute("DELETE FROM import_checkpoints WHERE file_hash = ?", (file_hash,))
+    mm.db.commit()
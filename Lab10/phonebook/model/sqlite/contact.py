@@ -0,0 +1,322 @@
+import json
+import re
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+from .. import ModelManager
+from .. import phone
+from ..contact import (Contact, ContactForCreate, ContactForUpdate, ContactPage, GetManyFilters,
+                       _reindex, decode_after, encode_after)
+from ..errors import EntityAlreadyExist, EntityNotExist
+from ..search import name_text, similarity
+from . import is_unique_violation
+from .phone import keys
+
+# Fuzzy searches score at most this many contacts per FTS5 query, the ones
+# it ranks best.
+CANDIDATES = 2000
+
+_WORD = re.compile(r"[^\W_]+")
+
+# The JSON counterpart of PHONES_LATERAL: [[id, num], ...] in id order.
+PHONES = """
+    (
+        SELECT json_group_array(json_array(id, phone_num))
+        FROM (SELECT id, phone_num FROM phones WHERE contact_id = c.id ORDER BY id)
+    )
+"""
+
+def from_row(row) -> Contact:
+    id, first_name, last_name, phones = row[:4]
+    return Contact(id, first_name, last_name, [phone.Phone(*p) for p in json.loads(phones)])
+
+def create(mm: ModelManager, contact: ContactForCreate) -> int:
+    try:
+        contact_id = mm.db.execute("""
+            INSERT INTO contacts (first_name, last_name)
+            VALUES (?, ?)
+        """, (contact.first_name, contact.last_name)).lastrowid
+
+        phone.create(mm, phone.PhoneForCreate(
+            contact.phone_num,
+            contact_id
+        ))
+    except Exception:
+        mm.db.rollback()
+        raise
+
+    mm.db.commit()
+
+    if mm.search_index is not None:
+        mm.search_index.add(contact_id, contact.first_name, contact.last_name, [contact.phone_num])
+    return contact_id
+
+def create_or_replace(mm: ModelManager, contact: ContactForCreate) -> int:
+    # What the create_or_replace_contact procedure does on Postgres.
+    if phone.exist(mm, contact.phone_num):
+        raise EntityAlreadyExist("phone", contact.phone_num, 0)
+
+    try:
+        row = mm.db.execute("""
+            SELECT id
+            FROM contacts
+            WHERE first_name = ? AND last_name = ?
+            ORDER BY id
+            LIMIT 1
+        """, (contact.first_name, contact.last_name)).fetchone()
+        if row is None:
+            contact_id = mm.db.execute("""
+                INSERT INTO contacts (first_name, last_name)
+                VALUES (?, ?)
+            """, (contact.first_name, contact.last_name)).lastrowid
+        else:
+            contact_id = row[0]
+            phone.delete_by_contact(mm, contact_id)
+
+        phone.create(mm, phone.PhoneForCreate(contact.phone_num, contact_id))
+    except Exception:
+        mm.db.rollback()
+        raise
+
+    mm.db.commit()
+
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact_id)
+
+    _reindex(mm, contact_id)
+    return contact_id
+
+def get(mm: ModelManager, id: int) -> Contact:
+    if mm.cache is not None:
+        cached = mm.cache.get_contact(id)
+        if cached is not None:
+            return cached
+
+    row = mm.db.execute(f"""
+        SELECT c.id, c.first_name, c.last_name, {PHONES}
+        FROM contacts c
+        WHERE c.id = ?
+    """, (id,)).fetchone()
+
+    if row is None:
+        raise EntityNotExist("contact", id)
+
+    contact = from_row(row)
+    if mm.cache is not None:
+        mm.cache.put_contact(contact)
+    return contact
+
+def get_by_phone(mm: ModelManager, num: str) -> Optional[Contact]:
+    row = mm.db.execute(f"""
+        SELECT c.id, c.first_name, c.last_name, {PHONES}
+        FROM phones p
+        JOIN contacts c ON c.id = p.contact_id
+        WHERE p.phone_e164 = ?
+    """, (phone.normalize(num),)).fetchone()
+    return from_row(row) if row is not None else None
+
+def find_by_phone_suffix(mm: ModelManager, suffix: str, limit: int = 50) -> List[Contact]:
+    low, high = phone.suffix_range(suffix)
+    rows = mm.db.execute(f"""
+        SELECT c.id, c.first_name, c.last_name, {PHONES}
+        FROM contacts c
+        WHERE c.id IN (
+            SELECT contact_id
+            FROM phones
+            WHERE phone_rev >= ? AND phone_rev < ?
+        )
+        ORDER BY c.id
+        LIMIT ?
+    """, (low, high, limit)).fetchall()
+    return [from_row(row) for row in rows]
+
+def _match(mm: ModelManager, query: str) -> List[tuple]:
+    return mm.db.execute("""
+        SELECT c.id, c.first_name, c.last_name
+        FROM (
+            SELECT rowid
+            FROM contacts_fts
+            WHERE contacts_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ) f
+        JOIN contacts c ON c.id = f.rowid
+    """, (query, CANDIDATES)).fetchall()
+
+def _candidates(mm: ModelManager, pattern: str) -> Iterable[tuple]:
+    # The trigram tokenizer matches substrings, so OR-ed trigrams of a word
+    # find every name sharing one with it. Words shorter than three
+    # characters have none; if no word is longer, every contact is a
+    # candidate.
+    words = [[f'"{word[i:i + 3]}"' for i in range(len(word) - 2)]
+             for word in _WORD.findall(pattern) if len(word) >= 3]
+    if not words:
+        return mm.db.execute("SELECT id, first_name, last_name FROM contacts")
+
+    # Ranking is what costs, so names sharing a trigram with every word go
+    # first: far fewer rows to rank than names sharing any. A word whose
+    # trigrams all have typos leaves too few of them, and then any shared
+    # trigram will do.
+    rows = _match(mm, " AND ".join(f"({' OR '.join(grams)})" for grams in words))
+    if len(rows) < CANDIDATES and len(words) > 1:
+        found = {row[0] for row in rows}
+        rows += [row for row in _match(mm, " OR ".join(sum(words, [])))
+                 if row[0] not in found]
+    return rows
+
+def _fuzzy_ids(mm: ModelManager, pattern: str, filters: GetManyFilters) -> List[Tuple[float, int]]:
+    # FTS5 only narrows the search down; candidates are then ranked by the
+    # pg_trgm similarity that Postgres uses, so both backends agree on the
+    # order and on the threshold.
+    ranked = []
+    for id, first_name, last_name in _candidates(mm, pattern):
+        sim = similarity(pattern, name_text(first_name, last_name))
+        if sim >= filters.threshold:
+            ranked.append((1 - sim, id))
+    ranked.sort()
+
+    offset = filters.offset
+    if filters.after is not None:
+        after = tuple(decode_after(filters.after))
+        ranked = [key for key in ranked if key > after]
+        offset = 0
+    return ranked[offset:offset + filters.limit]
+
+def get_page(mm: ModelManager, filters: GetManyFilters) -> ContactPage:
+    pattern = filters.pattern.replace('%', '').replace('_', '')
+    pattern = pattern.lower()
+
+    if len(pattern) > 0:
+        ranked = _fuzzy_ids(mm, pattern, filters)
+        rows = mm.db.execute(f"""
+            SELECT c.id, c.first_name, c.last_name, {PHONES}
+            FROM contacts c
+            WHERE c.id IN (SELECT value FROM json_each(?))
+        """, (json.dumps([id for _, id in ranked]),)).fetchall()
+        by_id = {row[0]: row for row in rows}
+        # A contact deleted in between is left out.
+        rows = [by_id[id] + (rank,) for rank, id in ranked if id in by_id]
+    else:
+        where = ""
+        params: list = []
+        if filters.after is not None:
+            where = "WHERE c.id > ?" if filters.inc else "WHERE c.id < ?"
+            params.append(decode_after(filters.after)[1])
+        params += [filters.limit, 0 if filters.after is not None else filters.offset]
+        rows = mm.db.execute(f"""
+            SELECT c.id, c.first_name, c.last_name, {PHONES}, c.id AS rank
+            FROM contacts c
+            {where}
+            ORDER BY c.id {"ASC" if filters.inc else "DESC"}
+            LIMIT ? OFFSET ?
+        """, params).fetchall()
+
+    after = None
+    if len(rows) == filters.limit and len(rows) > 0:
+        last = rows[-1]
+        after = encode_after(last[4], last[0])
+    return ContactPage([from_row(row) for row in rows], after)
+
+def count(mm: ModelManager) -> int:
+    return mm.db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+def _conflict(mm: ModelManager, contact: ContactForUpdate, created: list, updated: list) -> Optional[int]:
+    # The number update() was turned down for, like the constraint detail
+    # Postgres reports: one given twice, or one held by a phone the update
+    # neither deletes nor renumbers.
+    freed = json.dumps(contact.phones_d + [p.id for p in contact.phones_u])
+    seen = set()
+    for key in [key for _, _, key, _ in created] + [key for _, key, _, _, _ in updated]:
+        if key in seen:
+            return key
+        seen.add(key)
+        row = mm.db.execute("""
+            SELECT id
+            FROM phones
+            WHERE phone_e164 = ? AND id NOT IN (SELECT value FROM json_each(?))
+        """, (key, freed)).fetchone()
+        if row is not None:
+            return key
+    return None
+
+def update(mm: ModelManager, contact: ContactForUpdate) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact.id)
+
+    sets = []
+    params = []
+    if contact.first_name is not None:
+        sets.append("first_name = ?")
+        params.append(contact.first_name)
+    if contact.last_name is not None:
+        sets.append("last_name = ?")
+        params.append(contact.last_name)
+    params.append(contact.id)
+
+    # Also rejects invalid numbers before anything is written.
+    created = [(num, contact.id, *keys(num)) for num in contact.phones_c]
+    updated = [(p.num, *keys(p.num), p.id, contact.id) for p in contact.phones_u]
+    if mm.phone_filter is not None:
+        for _, _, key, _ in created:
+            mm.phone_filter.add(key)
+        for _, key, _, _, _ in updated:
+            mm.phone_filter.add(key)
+
+    db = mm.db
+    try:
+        if sets:
+            found = db.execute(f"UPDATE contacts SET {', '.join(sets)} WHERE id = ?", params).rowcount > 0
+        else:
+            found = db.execute("SELECT id FROM contacts WHERE id = ?", params).fetchone() is not None
+        if not found:
+            raise EntityNotExist("contact", contact.id)
+
+        if contact.phones_d:
+            db.executemany("DELETE FROM phones WHERE contact_id = ? AND id = ?",
+                           [(contact.id, id) for id in contact.phones_d])
+        if updated:
+            # SQLite checks the unique constraint row by row, so the numbers
+            # are moved out of the way first to let phones_u swap them.
+            db.executemany("UPDATE phones SET phone_e164 = -id WHERE id = ? AND contact_id = ?",
+                           [(id, contact_id) for *_, id, contact_id in updated])
+            db.executemany("""
+                UPDATE phones
+                SET phone_num = ?, phone_e164 = ?, phone_rev = ?
+                WHERE id = ? AND contact_id = ?
+            """, updated)
+        if created:
+            db.executemany("""
+                INSERT INTO phones (phone_num, contact_id, phone_e164, phone_rev)
+                VALUES (?, ?, ?, ?)
+            """, created)
+    except sqlite3.IntegrityError as error:
+        db.rollback()
+        if is_unique_violation(error):
+            raise EntityAlreadyExist("phone", _conflict(mm, contact, created, updated), 0)
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+    db.commit()
+    if mm.cache is not None:
+        # Again now that it is committed: a read in between may have cached
+        # the old row.
+        mm.cache.invalidate_contact(contact.id)
+    _reindex(mm, contact.id)
+
+def delete(mm: ModelManager, id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(id)
+
+    phone.delete_by_contact(mm, id)
+
+    if mm.db.execute("DELETE FROM contacts WHERE id = ?", (id,)).rowcount == 0:
+        mm.db.rollback()
+        raise EntityNotExist("contact", id)
+
+    mm.db.commit()
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(id)
+
+    if mm.search_index is not None:
+        mm.search_index.remove(id)
@@ -0,0 +1,28 @@
+import csv
+from typing import IO
+from .. import ModelManager
+from ..exporter import ITERSIZE
+
+def write_rows(mm: ModelManager, file: IO[str], itersize: int = ITERSIZE) -> int:
+    writer = csv.writer(file, delimiter=';', lineterminator='\n')
+    writer.writerow(['first_name', 'last_name', 'phones'])
+
+    # SQLite steps through the result as it is read, so itersize only sets
+    # how many rows are fetched per call.
+    curs = mm.db.execute("""
+        SELECT c.first_name, c.last_name, (
+            SELECT COALESCE(GROUP_CONCAT(phone_num, ';'), '')
+            FROM (SELECT phone_num FROM phones WHERE contact_id = c.id ORDER BY id)
+        )
+        FROM contacts c
+        ORDER BY c.id
+    """)
+    count = 0
+    while True:
+        rows = curs.fetchmany(itersize)
+        if not rows:
+            break
+        writer.writerows(rows)
+        count += len(rows)
+
+    return count
@@ -0,0 +1,77 @@
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+from .. import ModelManager
+from ..importer import (CHUNK_SIZE, Batch, ImportReport, ImportRow, Progress, Reject,
+                        _chunks, _phones)
+
+def _create_staging(mm: ModelManager) -> None:
+    # Nothing to stage: _load_chunk writes to the tables directly.
+    pass
+
+def _load_chunk(mm: ModelManager, chunk: List[ImportRow], report: ImportReport) -> None:
+    # No COPY or staging tables here: rows are checked in Python against
+    # the numbers already stored, with the same outcome as on Postgres.
+    # Leaves the transaction open, as on Postgres.
+    phones = _phones(chunk)
+    if mm.phone_filter is not None:
+        for _, _, key in phones:
+            mm.phone_filter.add(key)
+
+    by_row: Dict[int, List[tuple]] = {}
+    for row, num, key in phones:
+        by_row.setdefault(row, []).append((num, key))
+
+    db = mm.db
+    existing = {key for key, in db.execute("""
+        SELECT phone_e164 FROM phones
+        WHERE phone_e164 IN (SELECT value FROM json_each(?))
+    """, (json.dumps([key for _, _, key in phones]),))}
+
+    seen = set()
+    imported = 0
+    rejected = []
+    try:
+        for row in chunk:
+            row_phones = by_row.get(row.row, [])
+            if any(key in existing for _, key in row_phones):
+                rejected.append(Reject(row.row, "phone number already exists"))
+                continue
+            # Within the chunk the first row that mentions a number wins.
+            if any(key in seen for _, key in row_phones):
+                rejected.append(Reject(row.row, "phone number repeats an earlier row"))
+                continue
+            seen.update(key for _, key in row_phones)
+
+            contact_id = db.execute("INSERT INTO contacts (first_name, last_name) VALUES (?, ?)",
+                                    (row.first_name, row.last_name)).lastrowid
+            db.executemany("""
+                INSERT INTO phones (phone_num, contact_id, phone_e164, phone_rev)
+                VALUES (?, ?, ?, ?)
+            """, [(num, contact_id, key, str(key)[::-1]) for num, key in row_phones])
+            imported += 1
+    except Exception:
+        db.rollback()
+        raise
+
+    report.imported += imported
+    report.rejects += rejected
+
+def load_batches(mm: ModelManager, batches: Iterable[Batch],
+                 chunk_size: int = CHUNK_SIZE,
+                 progress: Optional[Progress] = None) -> ImportReport:
+    report = ImportReport()
+    started = time.perf_counter()
+
+    for valid, rejects in batches:
+        report.rejects += rejects
+        for chunk in _chunks(valid, chunk_size):
+            _load_chunk(mm, chunk, report)
+            mm.db.commit()
+        report.rows += len(valid) + len(rejects)
+        report.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    report.rejects.sort(key=lambda reject: reject.row)
+    return report
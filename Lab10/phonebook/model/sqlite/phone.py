@@ -0,0 +1,91 @@
+import sqlite3
+from typing import List, Tuple
+from .. import ModelManager
+from ..errors import EntityAlreadyExist
+from ..phone import Phone, PhoneForCreate, normalize
+from . import is_unique_violation
+
+def keys(num: str) -> Tuple[int, str]:
+    # phone_e164 and phone_rev for num.
+    key = normalize(num)
+    return key, str(key)[::-1]
+
+def create(mm: ModelManager, phone: PhoneForCreate) -> int:
+    if exist(mm, phone.num):
+        raise EntityAlreadyExist("phone", phone.num, 0)
+
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(phone.contact_id)
+
+    key, rev = keys(phone.num)
+    if mm.phone_filter is not None:
+        mm.phone_filter.add(key)
+
+    try:
+        curs = mm.db.execute("""
+            INSERT INTO phones (phone_num, contact_id, phone_e164, phone_rev)
+            VALUES (?, ?, ?, ?)
+        """, (phone.num, phone.contact_id, key, rev))
+    except sqlite3.IntegrityError as error:
+        if is_unique_violation(error):
+            raise EntityAlreadyExist("phone", key, 0)
+        raise
+    return curs.lastrowid
+
+def get_by_contact(mm: ModelManager, contact_id: int) -> List[Phone]:
+    if mm.cache is not None:
+        cached = mm.cache.get_phones(contact_id)
+        if cached is not None:
+            return cached
+
+    rows = mm.db.execute("""
+        SELECT id, phone_num
+        FROM phones
+        WHERE contact_id = ?
+    """, (contact_id,)).fetchall()
+    phones = [Phone(*row) for row in rows]
+
+    if mm.cache is not None:
+        mm.cache.put_phones(contact_id, phones)
+    return phones
+
+def exist(mm: ModelManager, num: str) -> bool:
+    key = normalize(num)
+    if mm.phone_filter is not None and not mm.phone_filter.might_contain(key):
+        return False
+
+    row = mm.db.execute("SELECT id FROM phones WHERE phone_e164 = ?", (key,)).fetchone()
+    return row is not None
+
+def update(mm: ModelManager, phone: Phone) -> None:
+    if exist(mm, phone.num):
+        raise EntityAlreadyExist("phone", phone.num, 0)
+
+    if mm.cache is not None:
+        mm.cache.invalidate_phone(phone.id)
+    key, rev = keys(phone.num)
+    if mm.phone_filter is not None:
+        mm.phone_filter.add(key)
+
+    try:
+        mm.db.execute("""
+            UPDATE phones
+            SET phone_num = ?, phone_e164 = ?, phone_rev = ?
+            WHERE id = ?
+        """, (phone.num, key, rev, phone.id))
+    except sqlite3.IntegrityError as error:
+        if is_unique_violation(error):
+            raise EntityAlreadyExist("phone", key, 0)
+        raise
+
+def delete(mm: ModelManager, id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_phone(id)
+
+    mm.db.execute("DELETE FROM phones WHERE id = ?", (id,))
+
+def delete_by_contact(mm: ModelManager, contact_id: int) -> None:
+    if mm.cache is not None:
+        mm.cache.invalidate_contact(contact_id)
+
+    mm.db.execute("DELETE FROM phones WHERE contact_id = ?", (contact_id,))
@@ -0,0 +1,11 @@
+from typing import Iterator
+from .. import ModelManager
+
+def _keys(mm: ModelManager, itersize: int) -> Iterator[int]:
+    curs = mm.db.execute("SELECT phone_e164 FROM phones")
+    while True:
+        rows = curs.fetchmany(itersize)
+        if not rows:
+            break
+        for key, in rows:
+            yield key
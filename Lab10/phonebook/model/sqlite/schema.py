@@ -0,0 +1,72 @@
+from .. import ModelManager
+
+# Same tables as the Postgres schema. phone_e164 and its reversed digits,
+# phone_rev, are filled in by model.sqlite.phone from phone.normalize(), as
+# SQLite has no phone_e164() function to call from a trigger. contacts_fts
+# is an FTS5 trigram index over "first last", kept up to date by triggers.
+SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL DEFAULT ''
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS phones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_num TEXT NOT NULL,
+            contact_id INTEGER NOT NULL REFERENCES contacts (id),
+            phone_e164 INTEGER NOT NULL UNIQUE,
+            phone_rev TEXT NOT NULL
+        )
+    """,
+    # For create_or_replace, which looks contacts up by name.
+    "CREATE INDEX IF NOT EXISTS contacts_name_idx ON contacts (first_name, last_name)",
+    "CREATE INDEX IF NOT EXISTS phones_contact_id_idx ON phones (contact_id)",
+    "CREATE INDEX IF NOT EXISTS phones_rev_idx ON phones (phone_rev)",
+    """
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts
+        USING fts5 (name, tokenize = 'trigram')
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts
+        BEGIN
+            INSERT INTO contacts_fts (rowid, name)
+            VALUES (new.id, new.first_name || ' ' || new.last_name);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_update
+        AFTER UPDATE OF first_name, last_name ON contacts
+        BEGIN
+            UPDATE contacts_fts
+            SET name = new.first_name || ' ' || new.last_name
+            WHERE rowid = new.id;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts
+        BEGIN
+            DELETE FROM contacts_fts WHERE rowid = old.id;
+        END
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            file_hash TEXT PRIMARY KEY,
+            byte_offset INTEGER NOT NULL,
+            line INTEGER NOT NULL,
+            imported INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+]
+
+def migrate(mm: ModelManager) -> None:
+    for step in SCHEMA:
+        mm.db.execute(step)
+    mm.db.commit()
+
+def create(mm: ModelManager) -> None:
+    migrate(mm)
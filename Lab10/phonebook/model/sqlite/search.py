@@ -0,0 +1,19 @@
+import json
+from typing import Iterator, List, Tuple
+from .. import ModelManager
+
+def _rows(mm: ModelManager, itersize: int) -> Iterator[Tuple[int, str, str, List[str]]]:
+    # SQLite has no server-side cursors; the result is stepped through as it
+    # is fetched, itersize rows per call.
+    curs = mm.db.execute("""
+        SELECT c.id, c.first_name, c.last_name, (
+            SELECT json_group_array(phone_num) FROM phones WHERE contact_id = c.id
+        )
+        FROM contacts c
+    """)
+    while True:
+        rows = curs.fetchmany(itersize)
+        if not rows:
+            break
+        for id, first_name, last_name, phones in rows:
+            yield id, first_name, last_name, json.loads(phones)
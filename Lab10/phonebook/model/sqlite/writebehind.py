@@ -0,0 +1,19 @@
+from typing import List
+from .. import ModelManager
+from ..contact import ContactForCreate
+from .phone import keys
+
+def _insert(mm: ModelManager, batch: List[ContactForCreate]) -> List[int]:
+    # No UNNEST here, but the statements are prepared once and the batch
+    # is still a single transaction.
+    db = mm.db
+    ids = []
+    for c in batch:
+        id = db.execute("INSERT INTO contacts (first_name, last_name) VALUES (?, ?)",
+                        (c.first_name, c.last_name)).lastrowid
+        db.execute("""
+            INSERT INTO phones (phone_num, contact_id, phone_e164, phone_rev)
+            VALUES (?, ?, ?, ?)
+        """, (c.phone_num, id, *keys(c.phone_num)))
+        ids.append(id)
+    return ids
@@ -0,0 +1,140 @@
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+import psycopg2.extensions
+from . import prepared
+
+log = logging.getLogger("model.queries")
+
+SAMPLES = 1024
+
+_SPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_EXECUTE = re.compile(r"\bEXECUTE (pb_\w+)")
+_SKIP = ("model.stats", "model.prepared", "model.aio")
+
+def normalize(sql: str) -> str:
+    sql = sql.strip()
+    match = _EXECUTE.search(sql)
+    if match and match.group(1) in prepared.SOURCES:
+        sql = prepared.SOURCES[match.group(1)]
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+def _caller() -> str:
+    # Innermost model function on the stack, e.g. "contact.get".
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith("model.") and not module.startswith(_SKIP):
+            return f"{module[len('model.'):]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+@dataclass
+class QueryStat:
+    sql: str
+    caller: str
+    count: int
+    total_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    rows: int
+    params: int
+
+class _Entry:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.params = 0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES)
+
+class QueryStats:
+    def __init__(self, slow_threshold: Optional[float] = 0.5) -> None:
+        self.enabled = True
+        # Seconds; statements at least this slow are logged. None disables.
+        self.slow_threshold = slow_threshold
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, params: int, rows: int, seconds: float) -> None:
+        caller = _caller()
+        sql = normalize(sql)
+        with self._lock:
+            entry = self._entries.get((sql, caller))
+            if entry is None:
+                entry = self._entries[(sql, caller)] = _Entry()
+            entry.count += 1
+            entry.total += seconds
+            entry.rows += max(rows, 0)
+            entry.params = params
+            entry.samples.append(seconds)
+
+        if self.slow_threshold is not None and seconds >= self.slow_threshold:
+            log.warning("slow query in %s: %.1f ms, %d rows: %s",
+                        caller, seconds * 1000, rows, sql)
+
+    def summary(self) -> List[QueryStat]:
+        with self._lock:
+            items = [(key, entry, sorted(entry.samples)) for key, entry in self._entries.items()]
+
+        res = []
+        for (sql, caller), entry, samples in items:
+            def pct(q: float) -> float:
+                return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+            res.append(QueryStat(sql, caller, entry.count, entry.total * 1000,
+                                 pct(0.50), pct(0.95), pct(0.99), entry.rows, entry.params))
+        return res
+
+    def top(self, n: int = 10, key: str = 'total_ms') -> List[QueryStat]:
+        return sorted(self.summary(), key=lambda stat: getattr(stat, key), reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+STATS = QueryStats()
+
+def _count(vars) -> int:
+    if vars is None:
+        return 0
+    return len(vars)
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        if not STATS.enabled:
+            return super().execute(query, vars)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            STATS.record(query if isinstance(query, str) else str(query),
+                         _count(vars), self.rowcount, time.perf_counter() - start)
+
+    def callproc(self, procname, parameters=None):
+        if not STATS.enabled:
+            return super().callproc(procname, parameters)
+        start = time.perf_counter()
+        try:
+            return super().callproc(procname, parameters)
+        finally:
+            STATS.record(f"CALL {procname}", _count(parameters), self.rowcount,
+                         time.perf_counter() - start)
+
+    def copy_expert(self, sql, file, size=8192):
+        if not STATS.enabled:
+            return super().copy_expert(sql, file, size)
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            STATS.record(sql, 0, self.rowcount, time.perf_counter() - start)
@@ -0,0 +1,171 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+from . import ModelManager
+from . import contact
+from . import phone
+from .backend import dispatch
+from .contact import ContactForCreate
+from .errors import ModelError
+
+MAX_ITEMS = 500
+MAX_DELAY = 0.05
+
+_Item = Tuple[ContactForCreate, Future]
+
+@dispatch
+def _insert(mm: ModelManager, batch: List[ContactForCreate]) -> List[int]:
+    # Inserts the batch in the current transaction and returns the new ids
+    # in batch order.
+    with mm.db.cursor() as curs:
+        curs.execute("""
+            SELECT nextval(pg_get_serial_sequence('contacts', 'id'))
+            FROM generate_series(1, %s)
+        """, (len(batch),))
+        ids = [row[0] for row in curs.fetchall()]
+        curs.execute("""
+            INSERT INTO contacts (id, first_name, last_name)
+            SELECT * FROM UNNEST(%s::int[], %s::text[], %s::text[]);
+            INSERT INTO phones (phone_num, contact_id)
+            SELECT * FROM UNNEST(%s::text[], %s::int[])
+        """, (ids, [c.first_name for c in batch], [c.last_name for c in batch],
+              [c.phone_num for c in batch], ids))
+    return ids
+
+class WriteBehind:
+    # Queues contact creates and writes them from a background thread, many
+    # per transaction: every max_items items, or max_delay seconds after the
+    # oldest queued one. A future resolves to the new id once its
+    # transaction has committed.
+    def __init__(self, factory: Callable[[], ModelManager] = ModelManager.pooled,
+                 max_items: int = MAX_ITEMS, max_delay: float = MAX_DELAY) -> None:
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._factory = factory
+        self.mm: Optional[ModelManager] = None
+        self._queue: List[_Item] = []
+        self._oldest = 0.0
+        self._queued = 0
+        self._written = 0
+        self._flush_to = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def create(self, c: ContactForCreate) -> "Future[int]":
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise ModelError("write-behind queue is closed")
+            if not self._queue:
+                # Wakes the writer to start the max_delay countdown.
+                self._oldest = time.monotonic()
+                self._cond.notify_all()
+            self._queue.append((c, future))
+            self._queued += 1
+            if len(self._queue) >= self.max_items:
+                self._cond.notify_all()
+        return future
+
+    def flush(self) -> None:
+        # Returns once everything queued before the call is committed or
+        # has failed.
+        with self._cond:
+            self._flush_to = target = self._queued
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._written >= target)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self) -> "WriteBehind":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _ready(self) -> bool:
+        return (self._closed or len(self._queue) >= self.max_items
+                or bool(self._queue) and self._written < self._flush_to)
+
+    def _take(self) -> Optional[List[_Item]]:
+        with self._cond:
+            while not self._ready():
+                if self._queue:
+                    timeout = self._oldest + self.max_delay - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                else:
+                    self._cond.wait()
+            if not self._queue:
+                return None
+            # What is left is newer than _oldest, so keeping it only makes
+            # the next batch go a little early.
+            batch = self._queue[:self.max_items]
+            self._queue = self._queue[self.max_items:]
+            return batch
+
+    def _done(self, count: int) -> None:
+        with self._cond:
+            self._written += count
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                batch = self._take()
+                if batch is None:
+                    return
+                try:
+                    if self.mm is None:
+                        self.mm = self._factory()
+                    self._write(batch)
+                except BaseException as error:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                finally:
+                    self._done(len(batch))
+        finally:
+            if self.mm is not None:
+                self.mm.close()
+
+    def _write(self, batch: List[_Item]) -> None:
+        mm = self.mm
+        valid = []
+        for c, future in batch:
+            try:
+                valid.append((c, phone.normalize(c.phone_num), future))
+            except ModelError as error:
+                future.set_exception(error)
+        if not valid:
+            return
+
+        try:
+            ids = _insert(mm, [c for c, _, _ in valid])
+            mm.db.commit()
+        except Exception:
+            # Usually a number that already exists or repeats within the
+            # batch; one at a time, only the offending creates fail.
+            mm.db.rollback()
+            for c, _, future in valid:
+                try:
+                    future.set_result(contact.create(mm, c))
+                except Exception as error:
+                    future.set_exception(error)
+            return
+
+        for id, (c, key, future) in zip(ids, valid):
+            if mm.phone_filter is not None:
+                mm.phone_filter.add(key)
+            if mm.search_index is not None:
+                mm.search_index.add(id, c.first_name, c.last_name, [c.phone_num])
+            future.set_result(id)
@@ -0,0 +1,97 @@
+import threading
+import pytest
+
+from model import checkpoint, contact
+from model.errors import ModelError
+from model.checkpoint import Checkpoint
+from model.parallel_import import import_resumable
+
+ROWS = 3000
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "contacts.csv"
+    with open(path, "w", newline="") as file:
+        file.write("first_name;last_name;phones\n")
+        for i in range(ROWS):
+            if i % 100 == 0:
+                file.write(f"Bad{i};Lee;not a number\n")
+            elif i % 150 == 1:
+                # A quoted field across lines must not be cut.
+                file.write(f'"Two\nLines{i}";Lee;+1 555 {i:07d}\n')
+            else:
+                file.write(f"First{i};Last{i};+1 555 {i:07d}\n")
+    return path
+
+def test_save_load_clear(mm):
+    assert checkpoint.load(mm, "abc") is None
+    checkpoint.save(mm, Checkpoint("abc", 100, 5, 3, 1))
+    checkpoint.save(mm, Checkpoint("abc", 200, 9, 7, 1))
+    mm.db.commit()
+    assert checkpoint.load(mm, "abc") == Checkpoint("abc", 200, 9, 7, 1)
+
+    checkpoint.save(mm, Checkpoint("abc", 300, 12, 10, 1))
+    mm.db.rollback()
+    assert checkpoint.load(mm, "abc").offset == 200
+
+    checkpoint.clear(mm, "abc")
+    assert checkpoint.load(mm, "abc") is None
+
+def test_file_hash(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.write_bytes(b"x" * 3_000_000)
+    b.write_bytes(b"x" * 2_999_999 + b"y")
+    assert checkpoint.file_hash(a) != checkpoint.file_hash(b)
+    assert checkpoint.file_hash(a) == checkpoint.file_hash(a)
+
+class Crash(Exception):
+    pass
+
+def test_resume_after_crash(mm, csv_file):
+    def crash_after(spans):
+        def progress(report):
+            if report.rows > 0:
+                spans.pop()
+                if not spans:
+                    raise Crash()
+        return progress
+
+    with pytest.raises(Crash):
+        import_resumable(mm, csv_file, workers=1, chunk_bytes=8 << 10,
+                         progress=crash_after([None] * 3))
+    mm.db.rollback()
+
+    saved = checkpoint.load(mm, checkpoint.file_hash(csv_file))
+    assert saved is not None and 0 < saved.offset < csv_file.stat().st_size
+    assert contact.count(mm) == saved.imported
+
+    resumed = []
+    report = import_resumable(mm, csv_file, workers=1, chunk_bytes=8 << 10,
+                              progress=lambda r: resumed.append(r.resumed_line))
+    assert resumed[0] == saved.line
+    assert report.imported == contact.count(mm) == ROWS - ROWS // 100
+    assert report.rejected == ROWS // 100
+    assert report.offset == report.size
+    assert checkpoint.load(mm, checkpoint.file_hash(csv_file)) is None
+    assert contact.get_by_phone(mm, "+1 555 0000001").first_name == "Two\nLines1"
+
+def test_stop_keeps_checkpoint(mm, csv_file):
+    stop = threading.Event()
+    report = import_resumable(mm, csv_file, workers=1, chunk_bytes=8 << 10,
+                              progress=lambda r: r.rows > 0 and stop.set(), stop=stop)
+    assert 0 < report.offset < report.size
+    saved = checkpoint.load(mm, checkpoint.file_hash(csv_file))
+    assert saved.offset == report.offset
+    assert contact.count(mm) == report.imported
+
+    report = import_resumable(mm, csv_file, workers=1)
+    assert report.offset == report.size
+    assert contact.count(mm) == ROWS - ROWS // 100
+
+def test_unreadable_file(mm, tmp_path):
+    with pytest.raises(ModelError):
+        import_resumable(mm, tmp_path / "missing.csv", workers=1)
+    path = tmp_path / "latin1.csv"
+    path.write_bytes("first_name;last_name;phones\nJos\xe9;Lee;+1 555 0000001\n".encode("latin-1"))
+    with pytest.raises(ModelError):
+        import_resumable(mm, path, workers=1)
@@ -0,0 +1,134 @@
+import base64
+import pytest
+
+from model import contact, phone
+from model.contact import ContactForCreate, ContactForUpdate, GetManyFilters
+from model.errors import EntityAlreadyExist, EntityNotExist, ModelError
+from model.phone import Phone
+from model.phone_filter import PhoneFilter
+
+def add(mm, n):
+    return [contact.create(mm, ContactForCreate(f"First{i}", f"Last{i}", f"+1 555 {i:07d}"))
+            for i in range(n)]
+
+def test_create_and_get(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    c = contact.get(mm, id)
+    assert (c.id, c.first_name, c.last_name) == (id, "Ann", "Lee")
+    assert [p.num for p in c.phones] == ["+1 555 0000001"]
+
+def test_get_missing(mm):
+    with pytest.raises(EntityNotExist):
+        contact.get(mm, 12345)
+
+def test_create_existing_number(mm):
+    contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    with pytest.raises(EntityAlreadyExist):
+        contact.create(mm, ContactForCreate("Bob", "Lee", "+1 (555) 000-0001"))
+    assert contact.count(mm) == 1
+
+def test_create_or_replace(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    assert contact.create_or_replace(mm, ContactForCreate("Ann", "Lee", "+1 555 0000002")) == id
+    assert [p.num for p in contact.get(mm, id).phones] == ["+1 555 0000002"]
+
+    other = contact.create_or_replace(mm, ContactForCreate("Bob", "Lee", "+1 555 0000003"))
+    assert other != id
+    assert contact.count(mm) == 2
+
+def test_create_or_replace_past_stale_filter(mm):
+    # The filter was loaded before another client added the number.
+    mm.phone_filter = PhoneFilter(capacity=100)
+    contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    mm.phone_filter = PhoneFilter(capacity=100)
+
+    with pytest.raises(EntityAlreadyExist):
+        contact.create_or_replace(mm, ContactForCreate("Bob", "Lee", "+1 (555) 000-0001"))
+    assert contact.count(mm) == 1
+
+def test_get_by_phone(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+7 701 177 2020"))
+    assert contact.get_by_phone(mm, "8 701 177 20 20").id == id
+    assert contact.get_by_phone(mm, "+7 701 177 2021") is None
+
+def test_find_by_phone_suffix(mm):
+    ids = add(mm, 30)
+    found = contact.find_by_phone_suffix(mm, "0000012")
+    assert [c.id for c in found] == [ids[12]]
+    found = contact.find_by_phone_suffix(mm, "1", limit=100)
+    assert [c.id for c in found] == [ids[1], ids[11], ids[21]]
+
+def test_update_names_and_phones(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    first = contact.get(mm, id).phones[0]
+    contact.update(mm, ContactForUpdate(id, "Anna", None, ["+1 555 0000002", "+1 555 0000003"], [], []))
+    second = [p for p in contact.get(mm, id).phones if p.num == "+1 555 0000002"][0]
+
+    contact.update(mm, ContactForUpdate(id, None, "Li", [], [second.id],
+                                        [Phone(first.id, "+1 555 0000004")]))
+    c = contact.get(mm, id)
+    assert (c.first_name, c.last_name) == ("Anna", "Li")
+    assert sorted(p.num for p in c.phones) == ["+1 555 0000003", "+1 555 0000004"]
+
+def test_update_swaps_numbers(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    contact.update(mm, ContactForUpdate(id, None, None, ["+1 555 0000002"], [], []))
+    a, b = contact.get(mm, id).phones
+    contact.update(mm, ContactForUpdate(id, None, None, [], [], [Phone(a.id, b.num), Phone(b.id, a.num)]))
+    assert {p.id: p.num for p in contact.get(mm, id).phones} == {a.id: b.num, b.id: a.num}
+
+def test_update_conflict_names_the_number(mm):
+    contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    id = contact.create(mm, ContactForCreate("Bob", "Lee", "+1 555 0000002"))
+    # As typed or as E.164 digits, depending on the constraint that fired.
+    with pytest.raises(EntityAlreadyExist, match=r"\+1 555 0000001|15550000001"):
+        contact.update(mm, ContactForUpdate(id, "Robert", None, ["+1 555 0000001"], [], []))
+    # Nothing of the update is kept.
+    c = contact.get(mm, id)
+    assert c.first_name == "Bob"
+    assert [p.num for p in c.phones] == ["+1 555 0000002"]
+
+def test_update_missing(mm):
+    with pytest.raises(EntityNotExist):
+        contact.update(mm, ContactForUpdate(12345, "Ann", None, [], [], []))
+
+def test_delete(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    contact.delete(mm, id)
+    assert contact.count(mm) == 0
+    assert not phone.exist(mm, "+1 555 0000001")
+    with pytest.raises(EntityNotExist):
+        contact.delete(mm, id)
+
+@pytest.mark.parametrize("inc", [True, False])
+def test_pages_by_token_match_offsets(mm, inc):
+    add(mm, 25)
+    by_offset = [c.id for offset in range(0, 25, 10)
+                 for c in contact.get_many(mm, GetManyFilters(10, offset=offset, inc=inc))]
+
+    by_token = []
+    after = None
+    while True:
+        page = contact.get_page(mm, GetManyFilters(10, inc=inc, after=after))
+        by_token += [c.id for c in page.contacts]
+        if page.after is None:
+            break
+        after = page.after
+    assert by_token == by_offset
+    assert sorted(by_offset, reverse=not inc) == by_offset
+    assert len(by_offset) == 25
+
+@pytest.mark.parametrize("token", ["MQ==", "not base64!", "WzFd",
+                                   contact.encode_after("a", "b"), contact.encode_after(1, 2.5),
+                                   contact.encode_after(True, 1), contact.encode_after(1, 1 << 63),
+                                   base64.urlsafe_b64encode(b'{"a": 1, "b": 2}').decode()])
+def test_bad_page_token(mm, token):
+    with pytest.raises(ModelError):
+        contact.get_page(mm, GetManyFilters(10, after=token))
+    assert contact.count(mm) == 0
+
+def test_fuzzy_search(mm, fuzzy):
+    ronaldo = contact.create(mm, ContactForCreate("Cristiano", "Ronaldo", "+1 555 0000001"))
+    contact.create(mm, ContactForCreate("Lionel", "Messi", "+1 555 0000002"))
+    found = contact.get_many(mm, GetManyFilters(10, pattern="cristiano ronald"))
+    assert [c.id for c in found] == [ronaldo]
@@ -0,0 +1,41 @@
+import io
+
+from model import contact, importer
+from model.contact import ContactForCreate
+
+CSV = """first_name;last_name;phones
+Ann;Lee;+1 555 0000001
+;Nobody;+1 555 0000002
+Bob;Lee;
+Cid;Lee;not a number
+Dan;Lee;"+1 555 0000003;+1 (555) 000-0004"
+Eve;Lee;+1 555 0000003
+Fay;Lee;+1 555 0000009
+{long};Lee;+1 555 0000005
+Gus;Lee;{digits}
+""".format(long="X" * 300, digits="1" * 40)
+
+def reasons(report):
+    return {reject.row: reject.reason for reject in report.rejects}
+
+def test_validate():
+    row = importer.ImportRow(1, "Ann", "", ["+1 555 0000001"])
+    assert importer.validate(row) is None
+    row.first_name = "X" * 256
+    assert "longer" in importer.validate(row)
+
+def test_load_rows(mm):
+    contact.create(mm, ContactForCreate("Old", "Lee", "+1 555 0000009"))
+    report = importer.load_rows(mm, importer.read_rows(io.StringIO(CSV)), chunk_size=3)
+
+    assert report.imported == 2
+    assert report.rows == 9
+    assert sorted(reasons(report)) == [2, 3, 4, 6, 7, 8, 9]
+    assert "empty" in reasons(report)[2]
+    assert "longer" in reasons(report)[8]
+    assert "longer" in reasons(report)[9]
+
+    dan = contact.get_by_phone(mm, "+1 555 0000004")
+    assert dan.first_name == "Dan"
+    assert sorted(p.num for p in dan.phones) == ["+1 (555) 000-0004", "+1 555 0000003"]
+    assert contact.count(mm) == 3
@@ -0,0 +1,96 @@
+import pytest
+
+from model import contact, phone
+from model.backend import POSTGRES
+from model.contact import ContactForCreate
+from model.errors import EntityAlreadyExist, InvalidPhoneNumber
+from model.phone import Phone, PhoneForCreate
+from model.phone_filter import PhoneFilter
+
+@pytest.mark.parametrize("num, expected", [
+    ("+1 (555) 000-0001", 15550000001),
+    ("0044 20 7946 0000", 442079460000),
+    ("8 701 177 2020", 77011772020),
+    ("701 177 2020", 77011772020),
+])
+def test_normalize(num, expected):
+    assert phone.normalize(num) == expected
+
+# Arabic-Indic and fullwidth digits are not digits to phone_e164() in SQL,
+# so only the leading 7 counts.
+NON_ASCII = ["+7 \u0667\u0660\u0661 \u0661\u0667\u0667 \u0662\u0660\u0662\u0660",
+             "+7\uff17\uff10\uff11\uff11\uff17\uff17\uff12\uff10\uff12\uff10"]
+
+@pytest.mark.parametrize("num", NON_ASCII)
+def test_normalize_ascii_digits_only(num):
+    assert phone.normalize(num) == 7
+
+@pytest.mark.parametrize("num", ["", "abc", "+0 555", "+1 2345 6789 0123 4567"])
+def test_normalize_rejects(num):
+    with pytest.raises(InvalidPhoneNumber):
+        phone.normalize(num)
+
+def test_normalize_matches_sql(mm):
+    if mm.backend != POSTGRES:
+        pytest.skip("phone_e164() is a Postgres function")
+    nums = ["+1 (555) 000-0001", "0044 20 7946 0000", "8 701 177 2020", "+0 555", *NON_ASCII]
+    with mm.db.cursor() as curs:
+        for num in nums:
+            curs.execute("SELECT phone_e164(%s)", (num,))
+            try:
+                expected = phone.normalize(num)
+            except InvalidPhoneNumber:
+                expected = None
+            assert curs.fetchone()[0] == expected, num
+
+def test_create_and_get_by_contact(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    phone_id = phone.create(mm, PhoneForCreate("+1 555 0000002", id))
+    mm.db.commit()
+
+    phones = phone.get_by_contact(mm, id)
+    assert sorted(p.num for p in phones) == ["+1 555 0000001", "+1 555 0000002"]
+    assert phone_id in [p.id for p in phones]
+
+def test_exist_matches_any_spelling(mm):
+    contact.create(mm, ContactForCreate("Ann", "Lee", "+7 701 177 2020"))
+    assert phone.exist(mm, "8 (701) 177-20-20")
+    assert not phone.exist(mm, "+7 701 177 2021")
+
+def test_create_existing_number(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+7 701 177 2020"))
+    with pytest.raises(EntityAlreadyExist):
+        phone.create(mm, PhoneForCreate("87011772020", id))
+
+def test_update(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    old = phone.get_by_contact(mm, id)[0]
+    phone.update(mm, Phone(old.id, "+1 555 0000009"))
+    mm.db.commit()
+
+    assert [p.num for p in phone.get_by_contact(mm, id)] == ["+1 555 0000009"]
+    assert not phone.exist(mm, "+1 555 0000001")
+
+def test_delete_and_delete_by_contact(mm):
+    id = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    second = phone.create(mm, PhoneForCreate("+1 555 0000002", id))
+    third = phone.create(mm, PhoneForCreate("+1 555 0000003", id))
+    mm.db.commit()
+
+    phone.delete(mm, second)
+    mm.db.commit()
+    assert third in [p.id for p in phone.get_by_contact(mm, id)]
+    assert second not in [p.id for p in phone.get_by_contact(mm, id)]
+
+    phone.delete_by_contact(mm, id)
+    mm.db.commit()
+    assert phone.get_by_contact(mm, id) == []
+
+def test_filter_load(mm):
+    for i in range(5):
+        contact.create(mm, ContactForCreate(f"F{i}", "L", f"+1 555 000000{i}"))
+
+    filter = PhoneFilter(capacity=100)
+    filter.load(mm, itersize=2)
+    assert filter.count == 5
+    assert all(filter.might_contain(phone.normalize(f"+1 555 000000{i}")) for i in range(5))
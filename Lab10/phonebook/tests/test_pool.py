@@ -0,0 +1,15 @@
+import pytest
+
+import model
+from model.errors import ModelError
+from model.pool import ConnectionPool
+
+def test_timeout_is_model_error(postgres):
+    model.configure(postgres[0])
+    pool = ConnectionPool(model.get_config(), maxconn=1, timeout=0.1)
+    try:
+        with pool.connection():
+            with pytest.raises(ModelError, match="no connection available"):
+                model.ModelManager(pool).db
+    finally:
+        pool.close()
@@ -0,0 +1,17 @@
+from model import contact, phone
+from model.contact import ContactForCreate
+from model.phone import PhoneForCreate
+from model.search import SearchIndex
+
+def test_index_load(mm):
+    ann = contact.create(mm, ContactForCreate("Ann", "Lee", "+1 555 0000001"))
+    phone.create(mm, PhoneForCreate("+1 555 0000002", ann))
+    bob = contact.create(mm, ContactForCreate("Bob", "Stone", "+1 555 0000003"))
+    contact.create(mm, ContactForCreate("Carl", "Marsh", "+1 555 0000004"))
+    mm.db.commit()
+
+    index = SearchIndex()
+    index.load(mm, itersize=2)
+    assert len(index) == 3
+    assert [hit.id for hit in index.search("Bob Stone", 1)] == [bob]
+    assert [hit.id for hit in index.search("15550000002", 1)] == [ann]
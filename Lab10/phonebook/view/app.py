@@ -1,8 +1,72 @@
+from typing import List, Optional
+from textual import work
 from textual.app import App, ComposeResult
+from textual.message import Message
+from textual.timer import Timer
 from textual.widgets import Header, Footer
 
+from model.aio import AsyncModelManager
+from model.changes import Change, ChangeListener
+from model.errors import ModelError
+from view.contact_table import ContactTable
+from view.debug import QueryStatsScreen
+from view.search import SearchScreen
+
+# Changes elsewhere refresh the table at most this often.
+REFRESH_SECONDS = 0.5
+
+class ContactsChanged(Message):
+    def __init__(self, changes: List[Change]) -> None:
+        super().__init__()
+        self.changes = changes
+
 class PhonebookApp(App):
+    BINDINGS = [
+        ("ctrl+f", "search", "Search"),
+        ("f12", "show_queries", "Queries"),
+    ]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.model = AsyncModelManager()
+        self.changes = ChangeListener()
+        self._refresh: Optional[Timer] = None
+
     def compose(self) -> ComposeResult:
         yield Header()
+        yield ContactTable(id="contacts")
         yield Footer()
+
+    def on_mount(self) -> None:
+        self.changes.subscribe(lambda changes: self.post_message(ContactsChanged(changes)))
+        self.changes.refreshes(self.model)
+        self.listen()
+
+    @work(group="changes")
+    async def listen(self) -> None:
+        # An unreachable server is retried in the background.
+        try:
+            await self.changes.start()
+        except ModelError:
+            # No live refresh on SQLite.
+            pass
+
+    def on_contacts_changed(self, message: ContactsChanged) -> None:
+        # An import elsewhere is a stream of messages; they share a reload.
+        if self._refresh is None:
+            self._refresh = self.set_timer(REFRESH_SECONDS, self._reload)
+
+    def _reload(self) -> None:
+        self._refresh = None
+        self.screen_stack[0].query_one(ContactTable).reload()
+
+    def action_search(self) -> None:
+        self.push_screen(SearchScreen())
+
+    def action_show_queries(self) -> None:
+        self.push_screen(QueryStatsScreen())
+
+    async def on_unmount(self) -> None:
+        self.changes.stop()
+        await self.model.close()
     
@@ -0,0 +1,134 @@
+from typing import List, Optional, Set
+from rich.segment import Segment
+from textual import work
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from model.aio import contact
+from model.cache import LRUCache
+from model.contact import Contact, GetManyFilters, ModelError, encode_after
+
+class ContactTable(ScrollView, can_focus=True):
+    # Shows every contact but only holds the pages around the viewport:
+    # rows are fetched page by page as they scroll into view, and pages far
+    # from it are evicted.
+    DEFAULT_CSS = """
+    ContactTable {
+        height: 1fr;
+    }
+    """
+
+    def __init__(self, page_size: int = 100, prefetch: int = 2, max_pages: int = 16,
+                 name: Optional[str] = None, id: Optional[str] = None) -> None:
+        super().__init__(name=name, id=id)
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.total = 0
+        self._pages: LRUCache[int, List[Contact]] = LRUCache(max(max_pages, 2 * prefetch + 2), ttl=None)
+        self._pending: Set[int] = set()
+        # Whether _load_pages is running; there is only ever one, and it is
+        # never cancelled, as a cancel would reach the server too.
+        self._loading = False
+        # Bumped by reload, so that a page requested before is not kept.
+        self._generation = 0
+
+    def on_mount(self) -> None:
+        self.reload()
+
+    @work(exclusive=True, group="count")
+    async def reload(self) -> None:
+        # The first query is also where the connection is made, so this is
+        # where an unreachable database shows up.
+        try:
+            self.total = await contact.count(self.app.model)
+        except ModelError as error:
+            self.notify(str(error), severity='error')
+            return
+        self._generation += 1
+        self._pages.clear()
+        self._pending.clear()
+        self.virtual_size = Size(self.size.width, self.total)
+        self._prefetch()
+        self.refresh()
+
+    def _window(self) -> range:
+        first = int(self.scroll_y) // self.page_size
+        last = (int(self.scroll_y) + self.size.height) // self.page_size
+        pages = (self.total + self.page_size - 1) // self.page_size
+        return range(max(0, first - self.prefetch), min(pages, last + self.prefetch + 1))
+
+    def _prefetch(self) -> None:
+        for page in self._window():
+            if self._pages.get(page) is None:
+                self._pending.add(page)
+        if self._pending and not self._loading:
+            self._loading = True
+            self._load_pages()
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        self._prefetch()
+
+    def on_resize(self) -> None:
+        self._prefetch()
+
+    def _filters(self, page: int) -> GetManyFilters:
+        # Continue from the previous page when it is at hand: a keyset seek
+        # costs the same at any depth, unlike OFFSET.
+        previous = self._pages.get(page - 1) if page > 0 else None
+        if previous:
+            last = previous[-1].id
+            return GetManyFilters(self.page_size, after=encode_after(last, last))
+        return GetManyFilters(self.page_size, offset=page * self.page_size)
+
+    @work(group="pages")
+    async def _load_pages(self) -> None:
+        # Drains _pending, which scrolling keeps adding to; the pages nearest
+        # the middle of the window go first.
+        try:
+            while self._pending:
+                window = self._window()
+                # Pages that scrolled out of the window while waiting are dropped.
+                self._pending.intersection_update(window)
+                if not self._pending:
+                    break
+                middle = (window.start + window.stop) // 2
+                page = min(self._pending, key=lambda p: abs(p - middle))
+                self._pending.discard(page)
+
+                generation = self._generation
+                rows = await contact.get_many(self.app.model, self._filters(page))
+                if generation != self._generation:
+                    continue
+                self._pages.put(page, rows)
+                self.refresh_lines(page * self.page_size - int(self.scroll_y), self.page_size)
+        except ModelError as error:
+            # The pages are asked for again on the next scroll.
+            self._pending.clear()
+            self.notify(str(error), severity='error')
+        finally:
+            self._loading = False
+
+    def _format(self, row: int) -> str:
+        page, index = divmod(row, self.page_size)
+        rows = self._pages.get(page)
+        if rows is None:
+            return f"{'':>8}  ..."
+        if index >= len(rows):
+            return ""
+        c = rows[index]
+        name = f"{c.first_name} {c.last_name}"
+        phones = ", ".join(p.num for p in c.phones)
+        return f"{c.id:>8}  {name:<40.40}  {phones}"
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        row = scroll_y + y
+        width = self.size.width
+        if row >= self.total:
+            return Strip.blank(width, self.rich_style)
+
+        text = self._format(row)
+        strip = Strip([Segment(text.ljust(scroll_x + width), self.rich_style)])
+        return strip.crop(scroll_x, scroll_x + width)
@@ -1,11 +1,17 @@
-import csv
+from pathlib import Path
+from typing import Iterable
+from textual import work
+from textual.app import ComposeResult
+from textual.screen import Screen
+from textual.widgets import Button, DirectoryTree, Input, Label, ProgressBar
 
-def read_from_csv(path: Path) -> Iterable[ContactInfo]:
+import model.importer
+from model.aio import parallel_import
+from model.errors import ModelError
+
+def read_from_csv(path: Path) -> Iterable[model.importer.ImportRow]:
     with open(path, newline='') as file:
-        reader = csv.DictReader(file, delimiter=';')
-        for row in reader:
-            phones = row['phones'].split(';')
-            yield ContactInfo(row['first_name'], row['last_name'], phones)
+        yield from model.importer.read_rows(file)
 
 class FilterCSVDirTree(DirectoryTree):
     def filter_paths(self, paths: Iterable[Path]) -> Iterable[Path]:
@@ -21,18 +27,47 @@ class ImportCSVScreen(Screen):
         yield Label("Selected file:")
         yield Input(disabled=True)
         yield Button.success("OK", id="confirm")
-    
-    def on_mount(self) -> None:
-        self.contacts = Contacts()
+        yield ProgressBar(total=None, show_eta=False)
+        yield Label(id="progress")
 
     def on_directory_tree_file_selected(self, event: DirectoryTree.FileSelected) -> None:
         selected_file = self.query_one(Input)
         selected_file.value = str(event.path)
 
+    def show_progress(self, report: model.importer.ImportReport) -> None:
+        # Updates still queued when the screen was left.
+        if not self.is_attached:
+            return
+        if report.rows == 0 and report.resumed_line is not None:
+            self.notify(f"Resuming from row {report.resumed_line}")
+        self.query_one(ProgressBar).update(total=report.size, progress=report.offset)
+        eta = report.eta
+        self.query_one("#progress", expect_type=Label).update(
+            f"Imported: {report.imported}, wrong data: {report.rejected}, "
+            f"{report.rows_per_second:,.0f} rows/s"
+            + (f", {eta:,.0f} s left" if eta is not None else ""))
+
+    @work(exclusive=True)
+    async def run_import(self, path: Path) -> None:
+        self.query_one("#confirm", expect_type=Button).disabled = True
+        self.query_one("#progress", expect_type=Label).update("Checking file...")
+        # Commits as it goes: leaving the screen or a crash keeps what is
+        # in, and importing the same file again picks up from there.
+        try:
+            report = await parallel_import.import_resumable(self.app.model, path,
+                                                            progress=self.show_progress)
+        except ModelError as error:
+            # What was committed stays; the file can be imported again.
+            self.query_one("#progress", expect_type=Label).update("")
+            self.query_one("#confirm", expect_type=Button).disabled = False
+            self.notify(str(error), severity='error')
+            return
+        self.notify(f"Imported: {report.imported}")
+        if report.rejected:
+            self.notify(f"Wrong data: {report.rejected}", severity='error')
+        self.app.pop_screen()
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "confirm":
             selected_file = self.query_one(Input)
-            infos = read_from_csv(Path(selected_file.value))
-            wrong = self.contacts.add_many(infos)
-            self.notify(f"Wrong data: {wrong}", severity='error')
-            self.app.pop_screen()
+            self.run_import(Path(selected_file.value))
@@ -0,0 +1,44 @@
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.screen import Screen
+from textual.widgets import DataTable, Footer
+
+from model.stats import STATS
+
+TOP = 20
+REFRESH_SECONDS = 1.0
+
+class QueryStatsScreen(Screen):
+    BINDINGS = [
+        Binding("escape", "app.pop_screen", "Back"),
+        Binding("r", "reset", "Reset"),
+    ]
+
+    def compose(self) -> ComposeResult:
+        yield DataTable(cursor_type="row", zebra_stripes=True)
+        yield Footer()
+
+    def on_mount(self) -> None:
+        table = self.query_one(DataTable)
+        table.add_columns("caller", "count", "total ms", "p50 ms", "p95 ms", "p99 ms", "rows", "sql")
+        self.refresh_stats()
+        self.set_interval(REFRESH_SECONDS, self.refresh_stats)
+
+    def refresh_stats(self) -> None:
+        table = self.query_one(DataTable)
+        table.clear()
+        for stat in STATS.top(TOP):
+            table.add_row(
+                stat.caller,
+                str(stat.count),
+                f"{stat.total_ms:.1f}",
+                f"{stat.p50_ms:.2f}",
+                f"{stat.p95_ms:.2f}",
+                f"{stat.p99_ms:.2f}",
+                str(stat.rows),
+                stat.sql[:120],
+            )
+
+    def action_reset(self) -> None:
+        STATS.reset()
+        self.refresh_stats()
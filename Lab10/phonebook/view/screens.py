@@ -1,3 +1,12 @@
+from typing import List
+from textual import work
+from textual.app import ComposeResult
+from textual.screen import Screen
+from textual.widgets import Button, Input
+
+from model.aio import contact
+from model.contact import ContactForCreate, ContactForUpdate, ModelError
+from model.phone import Phone
 
 class NewContactScreen(Screen):
     def compose(self) -> ComposeResult:
@@ -8,25 +17,27 @@ class NewContactScreen(Screen):
         yield Button.success("Ok", id="confirm")
         yield Button.error("Cancel", id="cancel")
 
-    def on_mount(self) -> None:
-        self.contacts = Contacts()
+    @work(exclusive=True)
+    async def save(self, new: ContactForCreate) -> None:
+        try:
+            await contact.create(self.app.model, new)
+        except ModelError as error:
+            self.notify(str(error), severity='error')
+            return
+        self.app.pop_screen()
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "confirm":
             first_name = self.query_one("#first-name", expect_type=Input).value
             last_name = self.query_one("#last-name", expect_type=Input).value
             phone = self.query_one("#phone", expect_type=Input).value
-            self.contacts.add(ContactInfo(
-                first_name,
-                last_name,
-                phones=[phone]
-            )) 
-            self.app.pop_screen()
+            self.save(ContactForCreate(first_name, last_name, phone))
         elif event.button.id == "cancel":
+            self.workers.cancel_all()
             self.app.pop_screen()
 
 class UpdateContactScreen(Screen[bool]):
-    def __init__(self, id: int, first_name, last_name, phones) -> None:
+    def __init__(self, id: int, first_name: str, last_name: str, phones: List[Phone]) -> None:
         super().__init__()
         self.contact_id = id
         self.first_name = first_name
@@ -42,21 +53,38 @@ class UpdateContactScreen(Screen[bool]):
         yield Button.error("Cancel", id="cancel")
 
     def on_mount(self) -> None:
-        self.contacts = Contacts()
         self.query_one("#first-name", expect_type=Input).value = self.first_name
         self.query_one("#last-name", expect_type=Input).value = self.last_name
-        self.query_one("#phone", expect_type=Input).value = self.phones[0]
+        if self.phones:
+            self.query_one("#phone", expect_type=Input).value = self.phones[0].num
+
+    @work(exclusive=True)
+    async def save(self, changes: ContactForUpdate) -> None:
+        try:
+            await contact.update(self.app.model, changes)
+        except ModelError as error:
+            self.notify(str(error), severity='error')
+            return
+        self.dismiss(True)
     
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "confirm":
             first_name = self.query_one("#first-name", expect_type=Input).value
             last_name = self.query_one("#last-name", expect_type=Input).value
             phone = self.query_one("#phone", expect_type=Input).value
-            self.contacts.update(self.contact_id, ContactInfo(
-                first_name,
-                last_name,
-                phones=[phone]
-            )) 
-            self.dismiss(True)
+
+            changes = ContactForUpdate(
+                self.contact_id,
+                first_name if first_name != self.first_name else None,
+                last_name if last_name != self.last_name else None,
+                phones_c=[], phones_d=[], phones_u=[]
+            )
+            if not self.phones:
+                if phone:
+                    changes.phones_c.append(phone)
+            elif phone != self.phones[0].num:
+                changes.phones_u.append(Phone(self.phones[0].id, phone))
+            self.save(changes)
         elif event.button.id == "cancel":
+            self.workers.cancel_all()
             self.dismiss(False)
@@ -0,0 +1,73 @@
+from typing import List, Optional
+from textual import work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.screen import Screen
+from textual.timer import Timer
+from textual.widgets import DataTable, Footer, Input, Label
+
+from model.aio import contact
+from model.contact import Contact, GetManyFilters, ModelError
+from view.screens import UpdateContactScreen
+
+DEBOUNCE_SECONDS = 0.25
+LIMIT = 50
+
+class SearchScreen(Screen):
+    BINDINGS = [Binding("escape", "app.pop_screen", "Back")]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._timer: Optional[Timer] = None
+        self._shown: List[Contact] = []
+
+    def compose(self) -> ComposeResult:
+        yield Input(placeholder="Search by name")
+        yield Label(id="status")
+        yield DataTable(cursor_type="row", zebra_stripes=True)
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.query_one(DataTable).add_columns("id", "name", "phones")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+        query = event.value.strip().lower()
+        self._timer = self.set_timer(DEBOUNCE_SECONDS, lambda: self.start_search(query))
+
+    def start_search(self, query: str) -> None:
+        if not query:
+            self.workers.cancel_group(self, "search")
+            self.show([], "")
+            return
+        # Every change goes to the database: similarity does not grow as
+        # the query gets longer, so no earlier result holds all the matches
+        # of a longer query.
+        self.search(query)
+
+    @work(exclusive=True, group="search")
+    async def search(self, query: str) -> None:
+        # exclusive cancels the previous search; a statement it has in
+        # flight is cancelled on the server.
+        self.query_one("#status", expect_type=Label).update("searching...")
+        try:
+            rows = await contact.get_many(self.app.model, GetManyFilters(LIMIT, pattern=query))
+        except ModelError as error:
+            self.query_one("#status", expect_type=Label).update("")
+            self.notify(str(error), severity='error')
+            return
+        self.show(rows, f"{len(rows)} found")
+
+    def show(self, rows: List[Contact], status: str) -> None:
+        self._shown = rows
+        self.query_one("#status", expect_type=Label).update(status)
+        table = self.query_one(DataTable)
+        table.clear()
+        for c in rows:
+            table.add_row(str(c.id), f"{c.first_name} {c.last_name}",
+                          ", ".join(p.num for p in c.phones))
+
+    def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        c = self._shown[event.cursor_row]
+        self.app.push_screen(UpdateContactScreen(c.id, c.first_name, c.last_name, c.phones))